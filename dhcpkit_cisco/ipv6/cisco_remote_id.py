@@ -42,6 +42,9 @@ class CiscoRemoteId(ProtocolElement):
         if not length:
             raise ValueError('Cisco Remote-ID length must be explicitly provided when parsing')
 
+        if len(buffer) < offset + length:
+            raise ValueError('Cisco Remote-ID buffer is shorter than the provided length')
+
         # First get the type field, why is this little-endian?
         remote_id_type = unpack_from('<H', buffer, offset=offset)[0]
         my_offset = 2
@@ -207,7 +210,7 @@ class CiscoEthernetRemoteId(CiscoRemoteId):
             raise ValueError("Cisco Remote-ID length incorrect")
 
         # Get the DUID
-        read_length, self.duid = DUID.parse(buffer, offset=8, length=duid_length)
+        read_length, self.duid = DUID.parse(buffer, offset=offset + my_offset, length=duid_length)
         my_offset += read_length
         if read_length != duid_length:
             # Mismatch in length, invalid DUID?
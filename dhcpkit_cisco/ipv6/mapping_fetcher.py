@@ -0,0 +1,211 @@
+"""
+Keep a local copy of the Remote-ID mapping up to date by polling the remote_id_mapper application
+"""
+import gzip
+import logging
+import os
+import threading
+import urllib.error
+import urllib.request
+
+from dhcpkit_cisco.ipv6.remote_id_mapping import RemoteIdMapping
+
+logger = logging.getLogger(__name__)
+
+# Fetchers are shared per URL so that reloading the server configuration doesn't start extra polling threads
+fetchers = {}
+fetchers_lock = threading.Lock()
+
+
+def get_fetcher(url: str, refresh_interval: float = 60, timeout: float = 10,
+                cache_filename: str = None, token: str = None) -> 'MappingFetcher':
+    """
+    Get the running fetcher for the given URL, or start a new one.
+
+    :param url: The URL of the mapping snapshot
+    :param refresh_interval: The number of seconds between polls
+    :param timeout: The timeout for each request in seconds
+    :param cache_filename: The local file to keep a copy of the mapping in
+    :param token: The token to authenticate to the remote_id_mapper application with
+    :return: The fetcher
+    """
+    with fetchers_lock:
+        fetcher = fetchers.get(url)
+        if fetcher is None:
+            fetcher = fetchers[url] = MappingFetcher(url, refresh_interval, timeout, cache_filename, token)
+            fetcher.start()
+        else:
+            fetcher.refresh_interval = refresh_interval
+            fetcher.timeout = timeout
+            if token:
+                fetcher.token = token
+
+            if cache_filename and fetcher.cache_filename != cache_filename:
+                # The cache is written on the next change of the mapping
+                fetcher.cache_filename = cache_filename
+                if fetcher.mapping is None:
+                    fetcher.load_cache()
+
+        return fetcher
+
+
+class MappingFetcher:
+    """
+    Poll the mapping snapshot with conditional GET requests and swap in a new mapping when it changes. An unchanged
+    mapping only costs a 304 response. Readers just use the mapping property, which is replaced atomically.
+
+    :param url: The URL of the mapping snapshot
+    :param refresh_interval: The number of seconds between polls
+    :param timeout: The timeout for each request in seconds
+    :param cache_filename: The local file to keep a copy of the mapping in, so a restart doesn't start cold
+    :param token: The token to authenticate to the remote_id_mapper application with
+    """
+
+    def __init__(self, url: str, refresh_interval: float = 60, timeout: float = 10, cache_filename: str = None,
+                 token: str = None):
+        self.url = url
+        """The URL of the mapping snapshot"""
+
+        self.refresh_interval = refresh_interval
+        """The number of seconds between polls"""
+
+        self.timeout = timeout
+        """The timeout for each request in seconds"""
+
+        self.cache_filename = cache_filename
+        """The local file to keep a copy of the mapping in"""
+
+        self.token = token
+        """The token to authenticate to the remote_id_mapper application with"""
+
+        self.mapping = None
+        """The current mapping, or None if no mapping could be fetched yet"""
+
+        self.etag = None
+        """The ETag of the current mapping"""
+
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def load_cache(self) -> bool:
+        """
+        Load the mapping from the local cache file. The first fetch afterwards sends the cached ETag, so the server
+        confirms that the cached mapping is current with a 304, or sends a new one.
+
+        :return: Whether a mapping was loaded
+        """
+        if not self.cache_filename:
+            return False
+
+        try:
+            with open(self.cache_filename, 'rb') as cache_file:
+                url, etag, data = cache_file.read().split(b'\n', 2)
+
+            if url.decode('utf-8') != self.url:
+                logger.warning("Ignoring Remote-ID mapping cache %s: it belongs to another URL", self.cache_filename)
+                return False
+
+            etag = etag.decode('ascii') or None
+            mapping = RemoteIdMapping.from_snapshot(data, version=etag.strip('"') if etag else None)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring Remote-ID mapping cache %s: %s", self.cache_filename, e)
+            return False
+
+        self.mapping = mapping
+        self.etag = etag
+        logger.info("Loaded Remote-ID mapping with %d entries from cache %s", len(mapping), self.cache_filename)
+        return True
+
+    def save_cache(self, data: bytes, etag: str = None):
+        """
+        Write a snapshot to the local cache file. A temporary file is renamed over the old one, so readers never see
+        a partial file.
+
+        :param data: The JSON encoded snapshot
+        :param etag: The ETag of the snapshot
+        """
+        if not self.cache_filename:
+            return
+
+        temp_filename = self.cache_filename + '.tmp'
+        try:
+            with open(temp_filename, 'wb') as cache_file:
+                cache_file.write(self.url.encode('utf-8') + b'\n' + (etag or '').encode('ascii') + b'\n')
+                cache_file.write(data)
+            os.replace(temp_filename, self.cache_filename)
+        except OSError as e:
+            logger.error("Cannot write Remote-ID mapping cache %s: %s", self.cache_filename, e)
+
+            # Don't leave a partial file behind
+            if os.path.exists(temp_filename):
+                os.unlink(temp_filename)
+
+    def fetch(self) -> bool:
+        """
+        Fetch the mapping if it has changed.
+
+        :return: Whether a new mapping was loaded
+        """
+        request = urllib.request.Request(self.url, headers={'Accept-Encoding': 'gzip'})
+        if self.token:
+            request.add_header('Authorization', 'Bearer ' + self.token)
+        if self.etag and self.mapping is not None:
+            request.add_header('If-None-Match', self.etag)
+
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                data = response.read()
+                if response.headers.get('Content-Encoding') == 'gzip':
+                    data = gzip.decompress(data)
+                etag = response.headers.get('ETag')
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                logger.debug("Remote-ID mapping from %s has not changed", self.url)
+                return False
+            raise
+
+        # Parse first, so a broken snapshot doesn't replace a working mapping
+        version = etag.strip('"') if etag else None
+        mapping = RemoteIdMapping.from_snapshot(data, version=version)
+
+        self.mapping = mapping
+        self.etag = etag
+        logger.info("Loaded Remote-ID mapping with %d entries from %s", len(mapping), self.url)
+
+        self.save_cache(data, etag)
+        return True
+
+    def refresh(self):
+        """
+        Fetch the mapping, logging instead of raising errors so that the previous mapping stays in use.
+        """
+        try:
+            self.fetch()
+        except (OSError, ValueError) as e:
+            logger.error("Cannot fetch Remote-ID mapping from %s: %s", self.url, e)
+
+    def run(self):
+        """
+        Poll for changes until stopped.
+        """
+        while not self.stopping.wait(self.refresh_interval):
+            self.refresh()
+
+    def start(self):
+        """
+        Load the initial mapping and start polling in the background. A cached mapping is used until the server
+        confirms it or provides a newer one, and also when the server can't be reached.
+        """
+        self.load_cache()
+        self.refresh()
+
+        self.thread = threading.Thread(target=self.run, name='MappingFetcher', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop polling.
+        """
+        self.stopping.set()
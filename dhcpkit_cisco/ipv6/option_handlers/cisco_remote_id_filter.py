@@ -0,0 +1,249 @@
+"""
+Option handler that only applies its sub-handlers to requests from specific Cisco switches, ports or VLANs
+"""
+import logging
+
+from dhcpkit.ipv6.option_handlers import OptionHandler
+from dhcpkit.ipv6.server.config_parser import ConfigError
+from dhcpkit.ipv6.transaction_bundle import TransactionBundle
+from dhcpkit.utils import normalise_hex
+from dhcpkit_cisco.ipv6.cisco_remote_id import CiscoEthernetRemoteId
+from dhcpkit_cisco.ipv6.mapping_fetcher import MappingFetcher, get_fetcher
+from dhcpkit_cisco.ipv6.option_handlers.utils import config_option, config_section
+from dhcpkit_cisco.ipv6.utils import get_cisco_remote_id
+
+logger = logging.getLogger(__name__)
+
+
+def parse_number_set(value: str, max_value: int) -> frozenset:
+    """
+    Parse a space separated list of numbers and ranges, like "1-24 48", into a set for fast matching.
+
+    :param value: The list of numbers and ranges
+    :param max_value: The highest allowed number
+    :return: The set of numbers
+    """
+    numbers = set()
+    for part in value.split():
+        first, separator, last = part.partition('-')
+        try:
+            first = int(first)
+            last = int(last) if separator else first
+        except ValueError:
+            raise ValueError("{} is not a number or range".format(part))
+
+        if not (0 <= first <= last <= max_value):
+            raise ValueError("{} is not a valid range between 0 and {}".format(part, max_value))
+
+        numbers.update(range(first, last + 1))
+
+    return frozenset(numbers)
+
+
+class CiscoRemoteIdMatcher:
+    """
+    Match a decoded Cisco Remote-ID against sets of switches, slots, modules, ports and VLANs. Criteria that are None
+    match everything.
+
+    :param switch_duids: The raw DUIDs of the switches to match
+    :param switch_names: The names of the switches to match, which requires a mapping to look up switch names
+    :param slots: The slots to match
+    :param modules: The modules to match
+    :param ports: The ports to match
+    :param vlans: The VLANs to match
+    """
+
+    def __init__(self, switch_duids: frozenset = None, switch_names: frozenset = None, slots: frozenset = None,
+                 modules: frozenset = None, ports: frozenset = None, vlans: frozenset = None):
+        self.switch_duids = switch_duids
+        self.switch_names = switch_names
+        self.slots = slots
+        self.modules = modules
+        self.ports = ports
+        self.vlans = vlans
+
+    def match(self, cisco_remote_id: CiscoEthernetRemoteId, switch_duid: bytes, fetcher: MappingFetcher = None) -> bool:
+        """
+        Check whether the Remote-ID matches all criteria.
+
+        :param cisco_remote_id: The decoded Remote-ID
+        :param switch_duid: The raw DUID of the switch
+        :param fetcher: The fetcher that provides the mapping with switch names
+        :return: Whether it matches
+        """
+        if self.slots is not None and cisco_remote_id.slot not in self.slots:
+            return False
+
+        if self.modules is not None and cisco_remote_id.module not in self.modules:
+            return False
+
+        if self.ports is not None and cisco_remote_id.port not in self.ports:
+            return False
+
+        if self.vlans is not None and cisco_remote_id.vlan not in self.vlans:
+            return False
+
+        if self.switch_duids is not None and switch_duid not in self.switch_duids:
+            return False
+
+        if self.switch_names is not None:
+            mapping = fetcher and fetcher.mapping
+            if mapping is None or mapping.switch_names.get(switch_duid) not in self.switch_names:
+                return False
+
+        return True
+
+
+class CiscoRemoteIdFilterOptionHandler(OptionHandler):
+    """
+    Apply a set of option handlers only to requests with a Cisco Remote-ID that matches the configured criteria.
+    When loaded from the configuration the filter wraps one option handler, which is configured in the filter's own
+    section: the handler option names it, handler-id gives its optional identifier and all other options starting with
+    handler- are passed to it without that prefix.
+
+    :param matcher: The criteria to match
+    :param option_handlers: The option handlers to apply to matching requests
+    :param fetcher: The fetcher that provides switch names, if matching on switch name
+    """
+
+    def __init__(self, matcher: CiscoRemoteIdMatcher, option_handlers: [OptionHandler],
+                 fetcher: MappingFetcher = None):
+        super().__init__()
+
+        self.matcher = matcher
+        """The criteria to match"""
+
+        self.option_handlers = option_handlers
+        """The option handlers to apply to matching requests"""
+
+        self.fetcher = fetcher
+        """The fetcher that provides switch names, if any"""
+
+    def match(self, bundle: TransactionBundle) -> bool:
+        """
+        Check whether the request in this bundle matches.
+
+        :param bundle: The transaction bundle
+        :return: Whether the sub-handlers should be applied
+        """
+        cisco_remote_id = get_cisco_remote_id(bundle)
+        if cisco_remote_id is None:
+            return False
+
+        return self.matcher.match(cisco_remote_id, bundle.cisco_switch_duid, self.fetcher)
+
+    def pre(self, bundle: TransactionBundle):
+        """
+        Pass the bundle to the sub-handlers if it matches.
+
+        :param bundle: The transaction bundle
+        """
+        if self.match(bundle):
+            for option_handler in self.option_handlers:
+                option_handler.pre(bundle)
+
+    def handle(self, bundle: TransactionBundle):
+        """
+        Pass the bundle to the sub-handlers if it matches.
+
+        :param bundle: The transaction bundle
+        """
+        if self.match(bundle):
+            for option_handler in self.option_handlers:
+                option_handler.handle(bundle)
+
+    def post(self, bundle: TransactionBundle):
+        """
+        Pass the bundle to the sub-handlers if it matches.
+
+        :param bundle: The transaction bundle
+        """
+        if self.match(bundle):
+            for option_handler in self.option_handlers:
+                option_handler.post(bundle)
+
+    @classmethod
+    def from_config(cls, section: dict, option_handler_id: str = None) -> OptionHandler:
+        """
+        Create a handler of this class based on the configuration in the config section.
+
+        :param section: The configuration section
+        :param option_handler_id: Optional extra identifier
+        :return: A handler object
+        :rtype: OptionHandler
+        """
+        from dhcpkit.ipv6.option_handler_registry import option_handler_registry
+
+        section = config_section(section, 'cisco-remote-id-filter', option_handler_id)
+
+        def number_set(name: str, max_value: int) -> frozenset or None:
+            if name not in section:
+                return None
+
+            numbers = parse_number_set(section[name], max_value)
+            if not numbers:
+                raise ValueError("{} must not be empty, leave it out to match everything".format(name))
+
+            return numbers
+
+        def word_set(name: str) -> frozenset or None:
+            if name not in section:
+                return None
+
+            words = frozenset(section[name].split())
+            if not words:
+                raise ValueError("{} must not be empty, leave it out to match everything".format(name))
+
+            return words
+
+        try:
+            switch_duids = word_set('switch-duid')
+            if switch_duids is not None:
+                switch_duids = frozenset(bytes.fromhex(normalise_hex(duid)) for duid in switch_duids)
+
+            switch_names = word_set('switch-name')
+
+            matcher = CiscoRemoteIdMatcher(
+                switch_duids=switch_duids,
+                switch_names=switch_names,
+                slots=number_set('slot', 2 ** 8 - 1),
+                modules=number_set('module', 2 ** 2 - 1),
+                ports=number_set('port', 2 ** 6 - 1),
+                vlans=number_set('vlan', 2 ** 12 - 1),
+            )
+        except ValueError as e:
+            raise ConfigError("Invalid filter in [{}]: {}".format(section.name, e))
+
+        fetcher = None
+        if switch_names is not None:
+            mapping_url = section.get('mapping-url')
+            if not mapping_url:
+                raise ConfigError("[{}] needs a mapping-url to match on switch-name".format(section.name))
+
+            mapping_refresh_interval = config_option(section, 'mapping-refresh-interval', float, 60)
+            mapping_timeout = config_option(section, 'mapping-timeout', float, 10)
+            if mapping_refresh_interval <= 0 or mapping_timeout <= 0:
+                raise ConfigError("The mapping-refresh-interval and mapping-timeout of [{}] must be positive".format(
+                    section.name))
+
+            fetcher = get_fetcher(mapping_url, mapping_refresh_interval, mapping_timeout,
+                                  cache_filename=section.get('mapping-cache-file'),
+                                  token=section.get('mapping-token'))
+
+        # Create the wrapped handler from the handler-* options
+        option_handler_name = section.get('handler')
+        if not option_handler_name:
+            raise ConfigError("[{}] needs a handler to apply to matching requests".format(section.name))
+
+        option_handler_class = option_handler_registry.get(option_handler_name)
+        if not option_handler_class or not issubclass(option_handler_class, OptionHandler):
+            raise ConfigError("Unknown option handler in [{}]: {}".format(section.name, option_handler_name))
+
+        handler_section = {name[8:]: value for name, value in section.items()
+                           if name.startswith('handler-') and name != 'handler-id'}
+
+        logger.debug("Creating filtered %s from config", option_handler_class.__name__)
+        option_handler = option_handler_class.from_config(handler_section,
+                                                          option_handler_id=section.get('handler-id'))
+
+        return cls(matcher, [option_handler], fetcher)
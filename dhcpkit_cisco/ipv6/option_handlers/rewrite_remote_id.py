@@ -2,45 +2,151 @@
 Option handler to rewrite hardcoded Cisco Remote-IDs to something more useful
 """
 
-import configparser
+import codecs
+import logging
 
 from dhcpkit.ipv6.extensions.remote_id import RemoteIdOption
 from dhcpkit.ipv6.option_handlers import OptionHandler
+from dhcpkit.ipv6.server.config_parser import ConfigError, str_to_bool
 from dhcpkit.ipv6.transaction_bundle import TransactionBundle
 from dhcpkit_cisco import CISCO_ENTERPRISE_ID
 from dhcpkit_cisco.ipv6.cisco_remote_id import CiscoEthernetRemoteId
+from dhcpkit_cisco.ipv6.mapping_fetcher import MappingFetcher, get_fetcher
+from dhcpkit_cisco.ipv6.option_handlers.tracing import PacketTrace, SlowPacketTracer
+from dhcpkit_cisco.ipv6.option_handlers.utils import LogThrottle, config_option, config_section
+from dhcpkit_cisco.ipv6.remote_id_lookup import RemoteIdLookupClient
+from dhcpkit_cisco.ipv6.single_flight import TooManyWaitersError
+from dhcpkit_cisco.ipv6.utils import get_cisco_remote_id
+
+logger = logging.getLogger(__name__)
 
 
 class RewriteRemoteIdOptionHandler(OptionHandler):
     """
-    Handler for rewriting  in responses
+    Handler for rewriting Cisco Remote-IDs in requests
+
+    :param log_remote_ids: Whether to log the Cisco Remote-IDs we see, off by default to keep logging out of the
+                           packet processing path
+    :param log_sample_rate: Only log one out of every log_sample_rate Cisco Remote-IDs
+    :param log_rate_limit: Maximum number of Cisco Remote-IDs to log per switch per second, 0 means unlimited
+    :param tracer: Optional tracer to record the timing of slow packets
+    :param fetcher: The fetcher that provides the mapping to new Remote-IDs
+    :param lookup_client: The client to look up new Remote-IDs per port, used when there is no mapping
     """
 
-    def __init__(self):
+    def __init__(self, log_remote_ids: bool = False, log_sample_rate: int = 1, log_rate_limit: float = 1,
+                 tracer: SlowPacketTracer = None, fetcher: MappingFetcher = None,
+                 lookup_client: RemoteIdLookupClient = None):
         super().__init__()
 
+        self.fetcher = fetcher
+        """The fetcher that provides the mapping to new Remote-IDs, if any"""
+
+        self.lookup_client = lookup_client
+        """The client to look up new Remote-IDs per port, if any"""
+
+        self.log_throttle = None
+        """Sampling and rate limiting for debug logging of the Cisco Remote-IDs we see, None if not logging"""
+
+        if log_remote_ids:
+            self.log_throttle = LogThrottle(sample_rate=log_sample_rate, rate_limit=log_rate_limit)
+
+        self.tracer = tracer
+        """The tracer for slow packets, if enabled"""
+
     def pre(self, bundle: TransactionBundle):
         """
         This handler modifies the incoming request and may substitute the remote-id option.
         """
-        # Try to find the Remote-ID option and stop processing if not found
-        remote_id_option = bundle.incoming_relay_messages[0].get_option_of_type(RemoteIdOption)
-        if not remote_id_option or not isinstance(remote_id_option, RemoteIdOption):
+        if not self.tracer:
+            self.process_remote_id(bundle)
             return
 
-        # Ok, there is an option, but is it a Cisco one?
-        if remote_id_option.enterprise_number != CISCO_ENTERPRISE_ID:
+        trace = self.tracer.start_trace()
+        try:
+            self.process_remote_id(bundle, trace)
+        finally:
+            self.tracer.finish_trace(trace)
+
+    def process_remote_id(self, bundle: TransactionBundle, trace: PacketTrace = None):
+        """
+        Find, decode and process the Cisco Remote-ID in the request.
+
+        :param bundle: The transaction bundle
+        :param trace: The trace to record the processing stages in, if tracing
+        """
+        # Get the decoded Cisco Remote-ID, this is shared with other handlers through the bundle
+        cisco_remote_id = get_cisco_remote_id(bundle)
+        if cisco_remote_id is None:
+            return
+
+        switch_duid = bundle.cisco_switch_duid
+
+        if trace:
+            trace.mark('parse')
+            trace.switch_duid = switch_duid
+            trace.cisco_remote_id = cisco_remote_id
+
+        # Logging is opt-in: the server doesn't filter debug messages, so checking the log level wouldn't help
+        if self.log_throttle:
+            self.log_remote_id(switch_duid, cisco_remote_id)
+            if trace:
+                trace.mark('log')
+
+        # Take a reference to the current mapping, the fetcher may swap it at any time
+        mapping = self.fetcher and self.fetcher.mapping or self.lookup_client
+        if mapping is None:
             return
 
-        # Cisco! Read the Ethernet Remote-ID
         try:
-            cisco_remote_id = CiscoEthernetRemoteId().parse(buffer=remote_id_option.remote_id,
-                                                            length=len(remote_id_option.remote_id))
-        except ValueError:
-            # Apparently not...
+            new_remote_id = mapping.lookup(switch_duid, cisco_remote_id.slot, cisco_remote_id.module,
+                                           cisco_remote_id.port, cisco_remote_id.vlan)
+        except (OSError, ValueError, TooManyWaitersError) as e:
+            logger.error("Cannot look up new Remote-ID: %s", e)
             return
 
-        print(cisco_remote_id)
+        if trace:
+            trace.mark('lookup')
+
+        if new_remote_id is None:
+            return
+
+        # Make sure we are replacing the original Cisco option
+        relay_message = bundle.incoming_relay_messages[0]
+        remote_id_option = relay_message.get_option_of_type(RemoteIdOption)
+        if remote_id_option.enterprise_number != CISCO_ENTERPRISE_ID:
+            return
+
+        # Substitute the option instead of modifying it, others might hold a reference to the original
+        new_enterprise_number, new_remote_id = new_remote_id
+        relay_message.options = [RemoteIdOption(new_enterprise_number, new_remote_id)
+                                 if option is remote_id_option else option
+                                 for option in relay_message.options]
+        if trace:
+            trace.mark('rewrite')
+
+    def log_remote_id(self, duid_bytes: bytes, cisco_remote_id: CiscoEthernetRemoteId):
+        """
+        Log the decoded Remote-ID, subject to sampling and per-switch rate limiting. The fields are also passed as
+        extra attributes on the log record so that structured log handlers can use them.
+
+        :param duid_bytes: The raw DUID of the switch, used as rate limiting key
+        :param cisco_remote_id: The decoded Remote-ID
+        """
+        if not self.log_throttle.allow(duid_bytes):
+            return
+
+        switch_duid = codecs.encode(duid_bytes, 'hex').decode('ascii')
+        logger.debug("Cisco Remote-ID from switch %s: slot %d, module %d, port %d, vlan %d",
+                     switch_duid, cisco_remote_id.slot, cisco_remote_id.module, cisco_remote_id.port,
+                     cisco_remote_id.vlan,
+                     extra={
+                         'cisco_switch_duid': switch_duid,
+                         'cisco_slot': cisco_remote_id.slot,
+                         'cisco_module': cisco_remote_id.module,
+                         'cisco_port': cisco_remote_id.port,
+                         'cisco_vlan': cisco_remote_id.vlan,
+                     })
 
     def handle(self, bundle: TransactionBundle):
         """
@@ -49,7 +155,7 @@ class RewriteRemoteIdOptionHandler(OptionHandler):
         pass
 
     @classmethod
-    def from_config(cls, section: configparser.SectionProxy, option_handler_id: str = None) -> OptionHandler:
+    def from_config(cls, section: dict, option_handler_id: str = None) -> OptionHandler:
         """
         Create a handler of this class based on the configuration in the config section.
 
@@ -58,4 +164,68 @@ class RewriteRemoteIdOptionHandler(OptionHandler):
         :return: A handler object
         :rtype: OptionHandler
         """
-        return cls()
+        section = config_section(section, 'rewrite-cisco-remote-id', option_handler_id)
+
+        log_remote_ids = config_option(section, 'log-remote-ids', str_to_bool, False)
+
+        log_sample_rate = config_option(section, 'log-sample-rate', int, 1)
+        if log_sample_rate < 1:
+            raise ConfigError("The log-sample-rate of [{}] must be a positive integer".format(section.name))
+
+        log_rate_limit = config_option(section, 'log-rate-limit', float, 1)
+        if log_rate_limit < 0:
+            raise ConfigError("The log-rate-limit of [{}] must not be negative".format(section.name))
+
+        tracer = None
+        slow_packet_threshold = config_option(section, 'slow-packet-threshold', float, 0)
+        if slow_packet_threshold < 0:
+            raise ConfigError("The slow-packet-threshold of [{}] must not be negative".format(section.name))
+        elif slow_packet_threshold:
+            slow_packet_buffer_size = config_option(section, 'slow-packet-buffer-size', int, 1000)
+            if slow_packet_buffer_size < 1:
+                raise ConfigError("The slow-packet-buffer-size of [{}] must be a positive integer".format(
+                    section.name))
+
+            slow_packet_dump_file = section.get('slow-packet-dump-file')
+            if not slow_packet_dump_file:
+                raise ConfigError("[{}] needs a slow-packet-dump-file when tracing slow packets".format(
+                    section.name))
+
+            # The threshold is configured in milliseconds
+            tracer = SlowPacketTracer(threshold=slow_packet_threshold / 1000,
+                                      buffer_size=slow_packet_buffer_size,
+                                      dump_filename=slow_packet_dump_file)
+            tracer.install_signal_handler()
+
+        fetcher = None
+        mapping_url = section.get('mapping-url')
+        if mapping_url:
+            mapping_refresh_interval = config_option(section, 'mapping-refresh-interval', float, 60)
+            mapping_timeout = config_option(section, 'mapping-timeout', float, 10)
+            if mapping_refresh_interval <= 0 or mapping_timeout <= 0:
+                raise ConfigError("The mapping-refresh-interval and mapping-timeout of [{}] must be positive".format(
+                    section.name))
+
+            fetcher = get_fetcher(mapping_url, mapping_refresh_interval, mapping_timeout,
+                                  cache_filename=section.get('mapping-cache-file'),
+                                  token=section.get('mapping-token'))
+
+        lookup_client = None
+        lookup_url = section.get('lookup-url')
+        if lookup_url:
+            lookup_timeout = config_option(section, 'lookup-timeout', float, 5)
+            lookup_cache_size = config_option(section, 'lookup-cache-size', int, 10000)
+            lookup_cache_ttl = config_option(section, 'lookup-cache-ttl', float, 300)
+            lookup_max_waiters = config_option(section, 'lookup-max-waiters', int, 0)
+            lookup_wait_timeout = config_option(section, 'lookup-wait-timeout', float, lookup_timeout)
+            if lookup_timeout <= 0 or lookup_wait_timeout <= 0 or lookup_cache_size < 0 or lookup_cache_ttl < 0 \
+                    or lookup_max_waiters < 0:
+                raise ConfigError("Invalid lookup settings in [{}]".format(section.name))
+
+            lookup_client = RemoteIdLookupClient(lookup_url, timeout=lookup_timeout,
+                                                 cache_size=lookup_cache_size, cache_ttl=lookup_cache_ttl,
+                                                 max_waiters=lookup_max_waiters, wait_timeout=lookup_wait_timeout,
+                                                 token=section.get('lookup-token'))
+
+        return cls(log_remote_ids=log_remote_ids, log_sample_rate=log_sample_rate, log_rate_limit=log_rate_limit,
+                   tracer=tracer, fetcher=fetcher, lookup_client=lookup_client)
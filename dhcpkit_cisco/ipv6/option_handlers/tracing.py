@@ -0,0 +1,182 @@
+"""
+Opt-in tracing of packets that take too long to process
+"""
+import codecs
+import collections
+import json
+import logging
+import signal
+import threading
+import time
+import weakref
+
+from dhcpkit_cisco.ipv6.cisco_remote_id import CiscoEthernetRemoteId
+
+logger = logging.getLogger(__name__)
+
+# The tracers to dump per signal. One signal handler dumps all of them, so several traced handlers can share a signal.
+# Tracers of handlers that are discarded (i.e. after reloading the configuration) disappear automatically. The lock is
+# re-entrant because the signal handler runs in the main thread, which may be holding it while installing a tracer.
+signal_tracers = {}
+signal_tracers_lock = threading.RLock()
+
+
+class PacketTrace:
+    """
+    Timing information about the processing of a single packet
+    """
+
+    def __init__(self):
+        self.timestamp = time.time()
+        """The wall clock time when processing started"""
+
+        self.start = time.perf_counter()
+        """The performance counter when processing started"""
+
+        self.last = self.start
+        """The performance counter at the end of the previous stage"""
+
+        self.stages = []
+        """A list of (stage name, duration) tuples"""
+
+        self.total = None
+        """The total processing time, set when the trace is finished"""
+
+        self.switch_duid = None
+        """The raw DUID of the switch the packet came from, if known"""
+
+        self.cisco_remote_id = None
+        """The decoded Remote-ID, if known"""
+
+    def mark(self, stage: str):
+        """
+        Record the end of a processing stage. The stage duration is the time since the previous mark.
+
+        :param stage: The name of the stage that just ended
+        """
+        now = time.perf_counter()
+        self.stages.append((stage, now - self.last))
+        self.last = now
+
+    def as_dict(self) -> dict:
+        """
+        Represent this trace as a dictionary that can be serialised as JSON. Times are in milliseconds.
+
+        :return: The trace data
+        """
+        data = {
+            'timestamp': self.timestamp,
+            'total_ms': self.total * 1000,
+            'stages_ms': collections.OrderedDict((stage, duration * 1000) for stage, duration in self.stages),
+        }
+
+        if self.switch_duid is not None:
+            data['switch_duid'] = codecs.encode(self.switch_duid, 'hex').decode('ascii')
+
+        if isinstance(self.cisco_remote_id, CiscoEthernetRemoteId):
+            data['slot'] = self.cisco_remote_id.slot
+            data['module'] = self.cisco_remote_id.module
+            data['port'] = self.cisco_remote_id.port
+            data['vlan'] = self.cisco_remote_id.vlan
+
+        return data
+
+
+class SlowPacketTracer:
+    """
+    Keep the traces of packets that took longer than a threshold in a bounded ring buffer, so the slowest packets can be
+    inspected without profiling the whole server.
+
+    :param threshold: Traces of packets that take at least this many seconds are kept
+    :param buffer_size: The maximum number of traces to keep, older traces are discarded
+    :param dump_filename: The file to write the traces to when dumping
+    """
+
+    def __init__(self, threshold: float, buffer_size: int = 1000, dump_filename: str = None):
+        self.threshold = threshold
+        """Minimum processing time in seconds for a packet to be considered slow"""
+
+        self.dump_filename = dump_filename
+        """The file to write the traces to when dumping"""
+
+        # Appending to a deque is thread-safe, copying it is protected by the lock
+        self.traces = collections.deque(maxlen=buffer_size)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def start_trace() -> PacketTrace:
+        """
+        Start tracing a new packet.
+
+        :return: The new trace
+        """
+        return PacketTrace()
+
+    def finish_trace(self, trace: PacketTrace):
+        """
+        Finish the trace and keep it if the packet was slow.
+
+        :param trace: The trace to finish
+        """
+        trace.total = time.perf_counter() - trace.start
+        if trace.total >= self.threshold:
+            with self.lock:
+                self.traces.append(trace)
+
+    def dump(self, filename: str = None) -> int:
+        """
+        Write the collected traces to a file as JSON, one trace per line. The buffer is cleared afterwards.
+
+        :param filename: The file to write to, defaults to the configured dump file
+        :return: The number of traces written
+        """
+        filename = filename or self.dump_filename
+        if not filename:
+            raise ValueError("No file name to dump slow packet traces to")
+
+        with self.lock:
+            traces = list(self.traces)
+            self.traces.clear()
+
+        with open(filename, 'a') as dump_file:
+            for trace in traces:
+                dump_file.write(json.dumps(trace.as_dict()) + '\n')
+
+        return len(traces)
+
+    def install_signal_handler(self, signal_number: int = signal.SIGUSR1):
+        """
+        Dump the traces when the given signal is received. All tracers installed for the same signal are dumped
+        together. This must be called from the main thread.
+
+        :param signal_number: The signal to dump on
+        """
+        with signal_tracers_lock:
+            tracers = signal_tracers.get(signal_number)
+            if tracers is None:
+                tracers = signal_tracers[signal_number] = weakref.WeakSet()
+
+            tracers.add(self)
+
+            # Someone else may have taken over the signal since the previous tracer was installed
+            if signal.getsignal(signal_number) is not dump_signal_tracers:
+                signal.signal(signal_number, dump_signal_tracers)
+
+
+# noinspection PyUnusedLocal
+def dump_signal_tracers(signum: int, frame):
+    """
+    Signal handler that dumps all tracers installed for the signal.
+
+    :param signum: The signal that was received
+    :param frame: The current stack frame
+    """
+    with signal_tracers_lock:
+        tracers = list(signal_tracers.get(signum, ()))
+
+    for tracer in tracers:
+        try:
+            count = tracer.dump()
+            logger.info("Dumped %d slow packet traces to %s", count, tracer.dump_filename)
+        except (OSError, ValueError) as e:
+            logger.error("Cannot dump slow packet traces: %s", e)
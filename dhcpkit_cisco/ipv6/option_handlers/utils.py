@@ -0,0 +1,120 @@
+"""
+Utility functions and classes for the Cisco option handlers
+"""
+import configparser
+import itertools
+import threading
+import time
+
+from dhcpkit.ipv6.server.config_parser import ConfigError
+
+
+def config_section(section: dict or configparser.SectionProxy, option_handler_name: str,
+                   option_handler_id: str = None) -> configparser.SectionProxy:
+    """
+    The server passes configuration sections as plain dictionaries. Wrap them in a SectionProxy so the typed getters
+    can be used and error messages can name the section. The values have already been interpolated when the
+    configuration was loaded, so they are not interpolated again.
+
+    :param section: The configuration section
+    :param option_handler_name: The name of the option handler, as used in the section name
+    :param option_handler_id: The optional extra identifier from the section name
+    :return: The section as a SectionProxy
+    """
+    if isinstance(section, configparser.SectionProxy):
+        return section
+
+    section_name = 'option {}'.format(option_handler_name)
+    if option_handler_id:
+        section_name += ' ' + option_handler_id
+
+    parser = configparser.ConfigParser(interpolation=None, default_section='')
+    parser.optionxform = str
+    parser.read_dict({section_name: section})
+    return parser[section_name]
+
+
+def config_option(section: configparser.SectionProxy, name: str, convert: callable, default=None):
+    """
+    Get an option from a configuration section and convert it, so that a typo in the configuration gives a
+    configuration error naming the option instead of a traceback.
+
+    :param section: The configuration section
+    :param name: The name of the option
+    :param convert: The function that converts the string value, i.e. int, float or str_to_bool
+    :param default: The value to use when the option is not present
+    :return: The converted value
+    """
+    value = section.get(name)
+    if value is None:
+        return default
+
+    try:
+        return convert(value)
+    except ValueError:
+        raise ConfigError("Invalid {} in [{}]: {!r}".format(name, section.name, value))
+
+
+class LogThrottle:
+    """
+    Decide whether a log line may be emitted. Lines are sampled 1-in-N and rate-limited per key (usually the switch
+    DUID) so that debug logging cannot slow down packet processing when a large access layer is busy.
+
+    :param sample_rate: Only emit one out of every sample_rate lines, 1 means no sampling
+    :param rate_limit: Maximum number of lines per key per second, may be fractional, 0 means no limit
+    :param max_keys: Maximum number of keys to keep track of before forgetting old state
+    """
+
+    def __init__(self, sample_rate: int = 1, rate_limit: float = 0, max_keys: int = 10000):
+        if sample_rate < 1:
+            raise ValueError("Sample rate must be a positive integer")
+
+        if rate_limit < 0:
+            raise ValueError("Rate limit must not be negative")
+
+        self.sample_rate = sample_rate
+        """Emit one out of every sample_rate lines"""
+
+        self.rate_limit = rate_limit
+        """Maximum number of lines per key per second"""
+
+        self.max_keys = max_keys
+        """Maximum number of keys in the rate limiting state"""
+
+        # itertools.count is thread-safe in CPython, so sampling doesn't need the lock
+        self.counter = itertools.count()
+
+        self.lock = threading.Lock()
+        self.buckets = {}
+
+    def allow(self, key: bytes) -> bool:
+        """
+        Determine whether a line for the given key may be logged now.
+
+        :param key: The rate limiting key, i.e. the DUID of the switch
+        :return: Whether to log
+        """
+        if self.sample_rate > 1 and next(self.counter) % self.sample_rate:
+            return False
+
+        if not self.rate_limit:
+            return True
+
+        now = time.monotonic()
+        with self.lock:
+            # A token bucket per key that holds up to one second worth of lines (but at least one line), so fractional
+            # rates like 0.5 (one line every two seconds) work as expected
+            capacity = max(self.rate_limit, 1)
+            tokens, last_update = self.buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - last_update) * self.rate_limit)
+
+            if tokens < 1:
+                self.buckets[key] = (tokens, now)
+                return False
+
+            if key not in self.buckets and len(self.buckets) >= self.max_keys:
+                # Don't let a flood of unknown switches fill up our memory
+                self.buckets.clear()
+
+            self.buckets[key] = (tokens - 1, now)
+            return True
@@ -0,0 +1,121 @@
+"""
+Look up new Remote-IDs one port at a time from the remote_id_mapper application, for inventories that are too big to
+distribute as a snapshot
+"""
+import codecs
+import collections
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from dhcpkit_cisco.ipv6.single_flight import SingleFlight
+
+
+class RemoteIdLookupClient:
+    """
+    Look up new Remote-IDs with a bounded cache in front of the lookup service. Concurrent cache misses for the same
+    port are coalesced into a single request, so a rebooting switch causes one request per port and not one request
+    per packet. The cache is only kept in memory, so unlike a mapping snapshot it starts cold after a restart.
+
+    :param url: The URL of the lookup service
+    :param timeout: The timeout for each request in seconds
+    :param cache_size: The maximum number of results to cache
+    :param cache_ttl: The number of seconds to cache results
+    :param max_waiters: The maximum number of threads waiting for the same port, 0 means unlimited
+    :param wait_timeout: The maximum number of seconds to wait for a request by another thread
+    :param token: The token to authenticate to the lookup service with
+    """
+
+    def __init__(self, url: str, timeout: float = 5, cache_size: int = 10000, cache_ttl: float = 300,
+                 max_waiters: int = 0, wait_timeout: float = None, token: str = None):
+        self.url = url
+        """The URL of the lookup service"""
+
+        self.timeout = timeout
+        """The timeout for each request in seconds"""
+
+        self.cache_size = cache_size
+        """The maximum number of results to cache"""
+
+        self.cache_ttl = cache_ttl
+        """The number of seconds to cache results"""
+
+        self.token = token
+        """The token to authenticate to the lookup service with"""
+
+        self.single_flight = SingleFlight(max_waiters=max_waiters, timeout=wait_timeout or timeout)
+        """Coalescing of concurrent requests for the same port"""
+
+        # Least recently used results are at the start
+        self.cache = collections.OrderedDict()
+        self.cache_lock = threading.Lock()
+
+    def lookup(self, duid: bytes, slot: int, module: int, port: int, vlan: int) -> (int, bytes) or None:
+        """
+        Find the new Remote-ID for a port. The lookup service gives an entry for the specific VLAN precedence over
+        the wildcard VLAN 0.
+
+        :param duid: The raw DUID of the switch
+        :param slot: The slot number
+        :param module: The module number
+        :param port: The port number
+        :param vlan: The VLAN
+        :return: The new enterprise number and Remote-ID, or None if the port is not mapped
+        """
+        key = (duid, slot, module, port, vlan)
+
+        now = time.monotonic()
+        with self.cache_lock:
+            entry = self.cache.get(key)
+            if entry is not None:
+                expires, result = entry
+                if expires > now:
+                    self.cache.move_to_end(key)
+                    return result
+
+        result = self.single_flight.do(key, lambda: self.fetch(key))
+
+        with self.cache_lock:
+            self.cache[key] = (time.monotonic() + self.cache_ttl, result)
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        return result
+
+    def fetch(self, key: tuple) -> (int, bytes) or None:
+        """
+        Ask the lookup service for the new Remote-ID of a port.
+
+        :param key: The (DUID, slot, module, port, VLAN) tuple
+        :return: The new enterprise number and Remote-ID, or None if the port is not mapped
+        """
+        duid, slot, module, port, vlan = key
+        query = urllib.parse.urlencode([
+            ('duid', codecs.encode(duid, 'hex').decode('ascii')),
+            ('slot', slot),
+            ('module', module),
+            ('port', port),
+            ('vlan', vlan),
+        ])
+        separator = '&' if '?' in self.url else '?'
+
+        request = urllib.request.Request(self.url + separator + query)
+        if self.token:
+            request.add_header('Authorization', 'Bearer ' + self.token)
+
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                data = json.loads(response.read().decode('ascii'))
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+            raise
+
+        try:
+            return data['new_enterprise_number'], codecs.decode(data['new_remote_id'], 'hex')
+        except (KeyError, TypeError):
+            raise ValueError("Invalid response from Remote-ID lookup service")
@@ -1,16 +1,40 @@
 from django.contrib import admin
-
-from dhcpkit_cisco.ipv6.remote_id_mapper.models import Switch, Slot, Port, Module
+from django.contrib.admin import helpers
+from django.db import models, transaction
+from django.db.models import Count, Value
+from django.db.models.functions import Concat, Length, Substr
+from django.template.response import TemplateResponse
+
+from dhcpkit_cisco.ipv6.remote_id_mapper.forms import BulkEnterpriseNumberForm, BulkRemoteIdAffixForm, BulkVlanForm
+from dhcpkit_cisco.ipv6.remote_id_mapper.models import Switch, Slot, Port, Module, SwitchProfile, ProfileSlot, \
+    MappingVersion
+from dhcpkit_cisco.ipv6.remote_id_mapper.reverse_index import remote_id_candidates
 from dhcpkit_cisco.ipv6.remote_id_mapper.utils import display_hex
 
+# How many conflicting ports to show when a bulk update is refused
+MAX_CONFLICTS_SHOWN = 20
+
+
+class ProfileSlotInline(admin.TabularInline):
+    model = ProfileSlot
+    extra = 1
+
+
+@admin.register(SwitchProfile)
+class SwitchProfileAdmin(admin.ModelAdmin):
+    list_display = ('name', 'number_of_slots', 'number_of_switches')
+    inlines = (ProfileSlotInline,)
+
 
 @admin.register(Switch)
 class SwitchAdmin(admin.ModelAdmin):
-    list_display = ('name', 'duid_hex', 'number_of_slots', 'number_of_ports')
+    list_display = ('name', 'duid_hex', 'profile', 'number_of_slots', 'number_of_ports')
+    list_filter = ('profile',)
+    actions = ('apply_profile',)
 
     fieldsets = [
         ('Switch definition', {
-            'fields': ('name', 'duid'),
+            'fields': ('name', 'duid', 'profile'),
         }),
     ]
 
@@ -19,6 +43,15 @@ class SwitchAdmin(admin.ModelAdmin):
 
     duid_hex.short_description = 'DUID'
 
+    def apply_profile(self, request, queryset):
+        slots_created = 0
+        for switch in queryset.filter(profile__isnull=False).select_related('profile'):
+            slots_created += switch.profile.materialise(switch)
+
+        self.message_user(request, "Created {} slots".format(slots_created))
+
+    apply_profile.short_description = 'Create missing slots and modules from profile'
+
 
 @admin.register(Slot)
 class SlotAdmin(admin.ModelAdmin):
@@ -51,6 +84,8 @@ class ModuleAdmin(admin.ModelAdmin):
 class PortAdmin(admin.ModelAdmin):
     list_display = ('__str__', 'admin_vlan', 'new_enterprise_number', 'new_remote_id_hex')
     list_filter = ('module__slot__switch', 'vlan')
+    search_fields = ('new_remote_id',)
+    actions = ('set_enterprise_number', 'replace_remote_id_prefix', 'replace_remote_id_suffix', 'move_to_vlan')
 
     fieldsets = [
         ('Port definition', {
@@ -73,3 +108,129 @@ class PortAdmin(admin.ModelAdmin):
 
     admin_vlan.short_description = 'VLAN'
     admin_vlan.admin_order_field = 'vlan'
+
+    def get_search_results(self, request, queryset, search_term):
+        # Look for exact Remote-IDs so the index can be used, and accept both hex and ASCII
+        if not search_term.strip():
+            return queryset, False
+
+        return queryset.filter(new_remote_id__in=remote_id_candidates(search_term)), False
+
+    def bulk_update(self, request, queryset, form_class, title, plan):
+        """
+        Show an intermediate page for a bulk update and execute it as a single UPDATE statement when confirmed. The
+        plan function gets the queryset and the cleaned form data and returns the ports to update, the update values
+        and a list of conflicting ports. Updates with conflicts are refused.
+        """
+        affected_count = None
+        conflicts = []
+
+        if '_check' in request.POST or '_apply' in request.POST:
+            form = form_class(request.POST)
+            if form.is_valid():
+                affected, updates, conflicts = plan(queryset, form.cleaned_data)
+                if '_apply' in request.POST and not conflicts:
+                    with transaction.atomic():
+                        count = affected.update(**updates)
+                        MappingVersion.bump()
+                    self.message_user(request, "Updated {} ports".format(count))
+                    return None
+
+                affected_count = affected.count()
+        else:
+            form = form_class()
+
+        context = dict(
+            self.admin_site.each_context(request),
+            title=title,
+            opts=self.model._meta,
+            form=form,
+            action=request.POST.get('action'),
+            action_checkbox_name=helpers.ACTION_CHECKBOX_NAME,
+            selected=request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            select_across=request.POST.get('select_across', '0'),
+            selected_count=queryset.count(),
+            affected_count=affected_count,
+            conflicts=[str(port) for port in conflicts[:MAX_CONFLICTS_SHOWN]],
+            more_conflicts=max(0, len(conflicts) - MAX_CONFLICTS_SHOWN),
+            media=self.media + form.media,
+        )
+        return TemplateResponse(request, 'admin/remote_id_mapper/port/bulk_update.html', context)
+
+    def set_enterprise_number(self, request, queryset):
+        def plan(ports, data):
+            return ports, {'new_enterprise_number': data['new_enterprise_number']}, []
+
+        return self.bulk_update(request, queryset, BulkEnterpriseNumberForm, "Set enterprise number", plan)
+
+    set_enterprise_number.short_description = 'Set enterprise number of selected ports'
+
+    def replace_remote_id_prefix(self, request, queryset):
+        def plan(ports, data):
+            old_value, new_value = data['old_value'], data['new_value']
+            affected = ports.filter(new_remote_id__startswith=old_value)
+            new_remote_id = Concat(Value(new_value, output_field=models.CharField()),
+                                   Substr('new_remote_id', len(old_value) + 1, output_field=models.CharField()))
+            conflicts = self.remote_id_conflicts(affected, old_value, new_value)
+            return affected, {'new_remote_id': new_remote_id}, conflicts
+
+        return self.bulk_update(request, queryset, BulkRemoteIdAffixForm, "Replace Remote-ID prefix", plan)
+
+    replace_remote_id_prefix.short_description = 'Replace Remote-ID prefix of selected ports'
+
+    def replace_remote_id_suffix(self, request, queryset):
+        def plan(ports, data):
+            old_value, new_value = data['old_value'], data['new_value']
+            affected = ports.filter(new_remote_id__endswith=old_value)
+            new_remote_id = Concat(Substr('new_remote_id', 1, Length('new_remote_id') - len(old_value),
+                                          output_field=models.CharField()),
+                                   Value(new_value, output_field=models.CharField()))
+            conflicts = self.remote_id_conflicts(affected, old_value, new_value)
+            return affected, {'new_remote_id': new_remote_id}, conflicts
+
+        return self.bulk_update(request, queryset, BulkRemoteIdAffixForm, "Replace Remote-ID suffix", plan)
+
+    replace_remote_id_suffix.short_description = 'Replace Remote-ID suffix of selected ports'
+
+    def move_to_vlan(self, request, queryset):
+        def plan(ports, data):
+            new_vlan = data['new_vlan']
+            affected = ports.exclude(vlan=new_vlan)
+
+            # Two selected entries for the same port can't both move to the new VLAN
+            conflicts = []
+            duplicates = affected.order_by().values('module_id', 'port_nr').annotate(entries=Count('id')) \
+                .filter(entries__gt=1)
+            for duplicate in duplicates:
+                conflicts.extend(affected.filter(module_id=duplicate['module_id'], port_nr=duplicate['port_nr']))
+
+            # And the port may already have an entry for the new VLAN
+            moving = set(affected.values_list('module_id', 'port_nr').iterator())
+            candidates = Port.objects.filter(vlan=new_vlan,
+                                             module_id__in=affected.order_by().values('module_id'),
+                                             port_nr__in=affected.order_by().values('port_nr')) \
+                .exclude(pk__in=affected.order_by().values('pk'))
+            conflicts.extend(port for port in candidates if (port.module_id, port.port_nr) in moving)
+
+            return affected, {'vlan': new_vlan}, conflicts
+
+        return self.bulk_update(request, queryset, BulkVlanForm, "Move to VLAN", plan)
+
+    move_to_vlan.short_description = 'Move selected ports to another VLAN'
+
+    @staticmethod
+    def remote_id_conflicts(ports, old_value, new_value):
+        """
+        Find the ports whose Remote-ID would become too long, or empty when the old value is the whole Remote-ID and
+        the new value is empty. A port without a Remote-ID can't be rewritten, so both are refused.
+        """
+        if not new_value:
+            return list(ports.filter(new_remote_id=old_value))
+
+        growth = len(new_value) - len(old_value)
+        if growth <= 0:
+            return []
+
+        max_length = Port._meta.get_field('new_remote_id').max_length
+        return list(ports.annotate(remote_id_length=Length('new_remote_id'))
+                    .filter(remote_id_length__gt=max_length - growth))
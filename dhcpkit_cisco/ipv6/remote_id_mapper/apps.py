@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class RemoteIdMapperConfig(AppConfig):
     name = 'dhcpkit_cisco.ipv6.remote_id_mapper'
     verbose_name = 'Remote-ID mapper'
+
+    def ready(self):
+        # Connect the signal handlers
+        # noinspection PyUnresolvedReferences
+        from dhcpkit_cisco.ipv6.remote_id_mapper import signals
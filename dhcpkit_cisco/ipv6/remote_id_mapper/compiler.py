@@ -0,0 +1,229 @@
+import collections
+import csv
+import hashlib
+import itertools
+import json
+
+from django.db.models import Count
+
+from dhcpkit_cisco.ipv6.remote_id_mapper.models import Port, Slot, Switch
+
+# Switches can share a DUID, the switch name keeps the order (and therefore the snapshot version) stable in that case
+PORT_KEY_FIELDS = ('module__slot__switch__duid', 'module__slot__slot_nr', 'module__module_nr', 'port_nr', 'vlan',
+                   'module__slot__switch__name')
+
+
+class PortRecord(collections.namedtuple('PortRecord', ['duid', 'switch_name', 'slot_nr', 'module_nr', 'port_nr',
+                                                       'vlan', 'new_enterprise_number', 'new_remote_id',
+                                                       'show_module'])):
+    """
+    A port as produced by the compiler. The fields are plain values, so using a record never causes a query.
+    """
+
+    __slots__ = ()
+
+    def __str__(self):
+        # Same as Port.__str__, but without querying the slot and its modules
+        if self.show_module:
+            descr = '{} Port {}/{}/{}'.format(self.switch_name, self.slot_nr, self.module_nr, self.port_nr)
+        else:
+            descr = '{} Port {}/{}'.format(self.switch_name, self.slot_nr, self.port_nr)
+
+        if self.vlan:
+            descr += ' (VLAN {})'.format(self.vlan)
+
+        return descr
+
+
+def iterate_switches():
+    """
+    Walk through all switches in (DUID, name) order without loading them all at once.
+
+    :return: An iterator over (DUID, name) tuples
+    """
+    return Switch.objects.order_by('duid', 'name').values_list('duid', 'name').iterator()
+
+
+def find_dummy_module_slots(slot_ids):
+    """
+    Find out which of the given slots don't have modules and only contain their dummy module. Ports in those slots
+    are shown without a module number, see Port.__str__.
+
+    :param slot_ids: The ids of the slots to check
+    :return: The set of ids of slots with only a dummy module
+    """
+    slot_ids = sorted(slot_ids)
+    dummy_module_slots = set()
+
+    # Keep the number of query parameters well below the limits of the database backends
+    for start in range(0, len(slot_ids), 500):
+        dummy_module_slots.update(Slot.objects.filter(id__in=slot_ids[start:start + 500], has_modules=False)
+                                  .annotate(module_count=Count('module')).filter(module_count=1)
+                                  .values_list('id', flat=True))
+
+    return dummy_module_slots
+
+
+def iterate_port_records(batch_size=10000):
+    """
+    Walk through all ports in key order (DUID, slot, module, port, VLAN). The ports are read with a single query
+    that is consumed in chunks (using a server-side cursor where the database backend supports it), so at most one
+    batch of ports is in memory at a time.
+
+    :param batch_size: The number of ports to process at a time
+    :return: An iterator over port records
+    """
+    ports = Port.objects.order_by(*PORT_KEY_FIELDS) \
+        .values_list('module__slot__switch__duid', 'module__slot__switch__name', 'module__slot_id',
+                     'module__slot__slot_nr', 'module__module_nr', 'port_nr', 'vlan',
+                     'new_enterprise_number', 'new_remote_id') \
+        .iterator()
+
+    while True:
+        batch = list(itertools.islice(ports, batch_size))
+        if not batch:
+            return
+
+        dummy_module_slots = find_dummy_module_slots({slot_id for _, _, slot_id, *_ in batch})
+
+        for (duid, switch_name, slot_id, slot_nr, module_nr, port_nr, vlan,
+             new_enterprise_number, new_remote_id) in batch:
+            yield PortRecord(duid, switch_name, slot_nr, module_nr, port_nr, vlan,
+                             new_enterprise_number, new_remote_id, slot_id not in dummy_module_slots)
+
+
+def skip_redundant_vlans(records):
+    """
+    Leave out VLAN-specific entries that map to the same Remote-ID as the wildcard entry (VLAN 0) of the same port,
+    as looking them up gives the same result. This relies on the wildcard coming first in key order. When switches
+    share a DUID the same key can occur more than once, and just like when loading a snapshot the last one wins.
+
+    :param records: Port records in key order
+    :return: An iterator over the remaining port records
+    """
+    wildcard_port = None
+    wildcard_value = None
+    for (duid, slot_nr, module_nr, port_nr, vlan), group in itertools.groupby(
+            records, key=lambda record: (record.duid, record.slot_nr, record.module_nr, record.port_nr, record.vlan)):
+        group = list(group)
+        port = (duid, slot_nr, module_nr, port_nr)
+        value = (group[-1].new_enterprise_number, group[-1].new_remote_id)
+        if vlan == 0:
+            wildcard_port, wildcard_value = port, value
+        elif port == wildcard_port and value == wildcard_value:
+            continue
+
+        yield from group
+
+
+def compile_ports(sink, batch_size=10000, redundant_vlans=True):
+    """
+    Stream all ports to a sink in key order. A sink is any object with a write(record) and a close() method. The sink
+    is only closed when all records have been written, so a failed compilation never looks like a complete one.
+
+    :param sink: The sink to write the port records to
+    :param batch_size: The number of ports to process at a time
+    :param redundant_vlans: Whether to include VLAN-specific entries that are the same as the wildcard entry
+    :return: The number of records written
+    """
+    records = iterate_port_records(batch_size=batch_size)
+    if not redundant_vlans:
+        records = skip_redundant_vlans(records)
+
+    count = 0
+    for record in records:
+        sink.write(record)
+        count += 1
+
+    sink.close()
+    return count
+
+
+class SnapshotSink:
+    """
+    Write port records as a snapshot in the format of remote_id_mapping.RemoteIdMapping.from_snapshot(). The output
+    is hashed while writing, so the version is known without keeping the snapshot in memory.
+
+    :param file: A binary file object to write to
+    :param switches: An iterable of (DUID, name) tuples, written before the ports
+    :param format_version: The snapshot format version
+    """
+
+    def __init__(self, file, switches, format_version):
+        self.file = file
+        self.switches = switches
+        self.format_version = format_version
+        self.encoder = json.JSONEncoder(separators=(',', ':'))
+        self.hash = hashlib.sha256()
+        self.started = False
+        self.separator = ''
+
+        # Encoding rows a chunk at a time is a lot faster than encoding them one by one
+        self.rows = []
+
+        self.version = None
+        """The hash of the snapshot, available after closing"""
+
+    def emit(self, data: str):
+        data = data.encode('ascii')
+        self.hash.update(data)
+        self.file.write(data)
+
+    def add_row(self, row: list):
+        self.rows.append(row)
+        if len(self.rows) >= 1000:
+            self.flush_rows()
+
+    def flush_rows(self):
+        if not self.rows:
+            return
+
+        # Strip the brackets of the encoded list of rows
+        self.emit(self.separator + self.encoder.encode(self.rows)[1:-1])
+        self.separator = ','
+        self.rows.clear()
+
+    def start(self):
+        self.started = True
+        self.emit('{"format":' + self.encoder.encode(self.format_version) + ',"switches":[')
+        for switch in self.switches:
+            self.add_row(list(switch))
+        self.flush_rows()
+        self.emit('],"ports":[')
+        self.separator = ''
+
+    def write(self, record: PortRecord):
+        if not self.started:
+            self.start()
+
+        self.add_row([record.duid, record.slot_nr, record.module_nr, record.port_nr, record.vlan,
+                      record.new_enterprise_number, record.new_remote_id])
+
+    def close(self):
+        if not self.started:
+            self.start()
+
+        self.flush_rows()
+        self.emit(']}')
+        self.version = self.hash.hexdigest()
+
+
+class CsvSink:
+    """
+    Write port records as CSV, with the port described the same way as in the admin.
+
+    :param file: A text file object to write to
+    """
+
+    header = ['port', 'duid', 'slot', 'module', 'port_nr', 'vlan', 'new_enterprise_number', 'new_remote_id']
+
+    def __init__(self, file):
+        self.writer = csv.writer(file)
+        self.writer.writerow(self.header)
+
+    def write(self, record: PortRecord):
+        self.writer.writerow([str(record), record.duid, record.slot_nr, record.module_nr, record.port_nr, record.vlan,
+                              record.new_enterprise_number, record.new_remote_id])
+
+    def close(self):
+        pass
@@ -11,9 +11,10 @@ class RemoteIdField(forms.MultiValueField):
     widget = RemoteIdInput
 
     def __init__(self, max_length, *args, **kwargs):
+        # The ASCII checkbox always has a value, so an optional field must accept an empty value as complete
         fields = (
             forms.BooleanField(required=False),
-            forms.CharField(max_length=max_length),
+            forms.CharField(max_length=max_length, required=kwargs.get('required', True)),
         )
 
         # Ignore widget override
@@ -41,3 +42,27 @@ class RemoteIdField(forms.MultiValueField):
                     raise ValidationError("Value is not a valid hexadecimal value")
 
         return value
+
+
+class BulkEnterpriseNumberForm(forms.Form):
+    new_enterprise_number = forms.IntegerField(min_value=0, max_value=2 ** 32 - 1)
+
+
+class BulkRemoteIdAffixForm(forms.Form):
+    old_value = RemoteIdField(max_length=512, required=False,
+                              help_text="Only ports whose Remote-ID starts or ends with this value are changed. "
+                                        "Leave empty to add the new value to all selected ports.")
+    new_value = RemoteIdField(max_length=512, required=False,
+                              help_text="Leave empty to strip the old value. Ports whose Remote-ID would become "
+                                        "empty are reported as conflicts.")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('old_value') == cleaned_data.get('new_value'):
+            raise ValidationError("The old and new values are the same")
+        return cleaned_data
+
+
+class BulkVlanForm(forms.Form):
+    new_vlan = forms.IntegerField(min_value=0, max_value=2 ** 12 - 1, label='New VLAN',
+                                  help_text="VLAN 0 is a wildcard that matches any VLAN")
@@ -0,0 +1,48 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dhcpkit_cisco.ipv6.remote_id_mapper.compiler import CsvSink, compile_ports
+from dhcpkit_cisco.ipv6.remote_id_mapper.snapshot import write_snapshot
+
+
+class Command(BaseCommand):
+    help = "Export the Remote-ID mapping to a file, streaming from the database so memory use stays constant"
+
+    def add_arguments(self, parser):
+        parser.add_argument('filename',
+                            help="the file to write to, it is replaced atomically when the export is complete")
+        parser.add_argument('--format', choices=('snapshot', 'csv'), default='snapshot',
+                            help="snapshot for DHCP servers (default) or CSV for humans")
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help="the number of ports to process at a time")
+        parser.add_argument('--skip-redundant-vlans', action='store_true',
+                            help="leave out VLAN entries that are the same as the port's VLAN 0 entry")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("The batch size must be at least 1")
+
+        filename = options['filename']
+        temp_filename = filename + '.tmp'
+
+        try:
+            if options['format'] == 'snapshot':
+                with open(temp_filename, 'wb') as file:
+                    version = write_snapshot(file, batch_size=options['batch_size'],
+                                             redundant_vlans=not options['skip_redundant_vlans'])
+                message = "Wrote snapshot version {} to {}".format(version, filename)
+            else:
+                with open(temp_filename, 'w', newline='') as file:
+                    count = compile_ports(CsvSink(file), batch_size=options['batch_size'],
+                                          redundant_vlans=not options['skip_redundant_vlans'])
+                message = "Wrote {} ports to {}".format(count, filename)
+
+            os.replace(temp_filename, filename)
+        except OSError as e:
+            raise CommandError("Can't write {}: {}".format(filename, e))
+        finally:
+            if os.path.exists(temp_filename):
+                os.unlink(temp_filename)
+
+        self.stdout.write(message)
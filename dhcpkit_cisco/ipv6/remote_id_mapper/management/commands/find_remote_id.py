@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dhcpkit_cisco.ipv6.remote_id_mapper.models import Port
+from dhcpkit_cisco.ipv6.remote_id_mapper.reverse_index import find_duplicate_remote_ids, find_ports, \
+    remote_id_candidates
+from dhcpkit_cisco.ipv6.remote_id_mapper.utils import display_hex
+
+
+class Command(BaseCommand):
+    help = "Find the physical port for a rewritten Remote-ID, or list Remote-IDs that are used more than once"
+
+    def add_arguments(self, parser):
+        parser.add_argument('enterprise_number', nargs='?', type=int,
+                            help="the enterprise number of the rewritten Remote-ID")
+        parser.add_argument('remote_id', nargs='?',
+                            help="the rewritten Remote-ID, in hexadecimal or ASCII")
+        parser.add_argument('--duplicates', action='store_true',
+                            help="list all rewritten Remote-IDs that are used by more than one port")
+
+    def handle(self, *args, **options):
+        if options['duplicates']:
+            self.show_duplicates()
+            return
+
+        if options['enterprise_number'] is None or not options['remote_id']:
+            raise CommandError("Provide an enterprise number and Remote-ID, or use --duplicates")
+
+        found = False
+        for remote_id in remote_id_candidates(options['remote_id']):
+            for port in find_ports(options['enterprise_number'], remote_id):
+                self.stdout.write('{}: {}'.format(display_hex(remote_id), port))
+                found = True
+
+        if not found:
+            raise CommandError("No port found for that Remote-ID")
+
+    def show_duplicates(self):
+        duplicates = find_duplicate_remote_ids()
+        if not duplicates:
+            self.stdout.write("No duplicate Remote-IDs found")
+            return
+
+        ports = Port.objects.select_related('module__slot__switch') \
+            .in_bulk([port_id for port_ids in duplicates.values() for port_id in port_ids])
+
+        for (new_enterprise_number, new_remote_id), port_ids in sorted(duplicates.items()):
+            self.stdout.write('{} {}:'.format(new_enterprise_number, display_hex(new_remote_id)))
+            for port_id in port_ids:
+                self.stdout.write('  {}'.format(ports[port_id]))
+
+        raise CommandError("Found {} duplicate Remote-IDs".format(len(duplicates)))
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+import dhcpkit_cisco.ipv6.remote_id_mapper.fields
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('remote_id_mapper', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SwitchProfile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'verbose_name': '    Switch profile',
+                'verbose_name_plural': '    Switch profiles',
+                'ordering': ('name',),
+            },
+        ),
+        migrations.CreateModel(
+            name='ProfileSlot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot_nr', dhcpkit_cisco.ipv6.remote_id_mapper.fields.SlotField()),
+                ('has_modules', models.BooleanField(default=False,
+                                                    help_text='Check this box if this slot has multiple (internal) modules')),
+                ('number_of_modules', models.PositiveSmallIntegerField(
+                    default=1, help_text='Ignored for slots without modules',
+                    validators=[django.core.validators.MinValueValidator(1),
+                                django.core.validators.MaxValueValidator(4)])),
+                ('first_port_nr', dhcpkit_cisco.ipv6.remote_id_mapper.fields.PortField(
+                    default=1, help_text='Cisco numbers front panel ports from 1, use 0 for slots that also have a '
+                                         'port 0')),
+                ('number_of_ports', models.PositiveSmallIntegerField(
+                    help_text='The number of ports per module',
+                    validators=[django.core.validators.MaxValueValidator(64)])),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                              to='remote_id_mapper.SwitchProfile')),
+            ],
+            options={
+                'verbose_name': 'Slot',
+                'verbose_name_plural': 'Slots',
+                'ordering': ('profile__name', 'slot_nr'),
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='profileslot',
+            unique_together={('profile', 'slot_nr')},
+        ),
+        migrations.AddField(
+            model_name='switch',
+            name='profile',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL,
+                                    help_text='Slots and modules from the profile are created automatically',
+                                    to='remote_id_mapper.SwitchProfile'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('remote_id_mapper', '0002_switch_profiles'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='port',
+            index_together={('new_remote_id', 'new_enterprise_number')},
+        ),
+    ]
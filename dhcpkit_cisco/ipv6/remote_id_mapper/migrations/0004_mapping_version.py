@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def create_mapping_version(apps, schema_editor):
+    MappingVersion = apps.get_model('remote_id_mapper', 'MappingVersion')
+    MappingVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('remote_id_mapper', '0003_port_remote_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MappingVersion',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('counter', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Mapping version',
+                'verbose_name_plural': 'Mapping versions',
+            },
+        ),
+        migrations.RunPython(create_mapping_version, migrations.RunPython.noop),
+    ]
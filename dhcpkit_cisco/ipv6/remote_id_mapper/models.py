@@ -1,13 +1,102 @@
+from django.core import validators
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
 
 from dhcpkit_cisco.ipv6.remote_id_mapper.fields import SlotField, ModuleField, PortField, VlanField, \
     EnterpriseNumberField, HexField, RemoteIdField
 
 
+class SwitchProfile(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+
+    class Meta:
+        verbose_name = '    Switch profile'
+        verbose_name_plural = '    Switch profiles'
+        ordering = ('name',)
+
+    def __str__(self):
+        return self.name
+
+    def number_of_slots(self):
+        return ProfileSlot.objects.filter(profile=self).count()
+
+    def number_of_switches(self):
+        return Switch.objects.filter(profile=self).count()
+
+    def materialise(self, switch):
+        """
+        Create the slots and modules of this profile that the switch doesn't have yet. Existing slots are left alone.
+        Everything is created with bulk inserts, so slots don't auto-create their dummy modules one by one.
+
+        :param switch: The switch to apply this profile to
+        :return: The number of slots created
+        """
+        with transaction.atomic():
+            existing_slot_nrs = set(switch.slot_set.values_list('slot_nr', flat=True))
+            profile_slots = [profile_slot for profile_slot in self.profileslot_set.all()
+                             if profile_slot.slot_nr not in existing_slot_nrs]
+            if not profile_slots:
+                return 0
+
+            Slot.objects.bulk_create([Slot(switch=switch, slot_nr=profile_slot.slot_nr,
+                                           has_modules=profile_slot.has_modules)
+                                      for profile_slot in profile_slots])
+
+            # Not all databases return the primary keys from a bulk insert, so look them up
+            slot_ids = dict(switch.slot_set.filter(slot_nr__in=[profile_slot.slot_nr for profile_slot in profile_slots])
+                            .values_list('slot_nr', 'id'))
+
+            Module.objects.bulk_create([Module(slot_id=slot_ids[profile_slot.slot_nr], module_nr=module_nr)
+                                        for profile_slot in profile_slots
+                                        for module_nr in range(profile_slot.number_of_modules
+                                                               if profile_slot.has_modules else 1)])
+
+            # Bulk inserts don't send signals
+            MappingVersion.bump()
+
+        return len(profile_slots)
+
+
+class ProfileSlot(models.Model):
+    profile = models.ForeignKey(SwitchProfile)
+    slot_nr = SlotField()
+
+    has_modules = models.BooleanField(default=False,
+                                      help_text="Check this box if this slot has multiple (internal) modules")
+    number_of_modules = models.PositiveSmallIntegerField(default=1,
+                                                         validators=[validators.MinValueValidator(1),
+                                                                     validators.MaxValueValidator(2 ** 2)],
+                                                         help_text="Ignored for slots without modules")
+    first_port_nr = PortField(default=1, help_text="Cisco numbers front panel ports from 1, use 0 for slots that "
+                                                   "also have a port 0")
+    number_of_ports = models.PositiveSmallIntegerField(validators=[validators.MaxValueValidator(2 ** 6)],
+                                                       help_text="The number of ports per module")
+
+    class Meta:
+        verbose_name = 'Slot'
+        verbose_name_plural = 'Slots'
+        unique_together = (('profile', 'slot_nr'),)
+        ordering = ('profile__name', 'slot_nr')
+
+    def __str__(self):
+        return '{} Slot {}'.format(self.profile.name, self.slot_nr)
+
+    def clean(self):
+        super().clean()
+
+        if self.first_port_nr is not None and self.number_of_ports is not None \
+                and self.first_port_nr + self.number_of_ports > 2 ** 6:
+            raise ValidationError({'number_of_ports': "Port numbers can't go higher than {}".format(2 ** 6 - 1)})
+
+    def has_port(self, port_nr):
+        return self.first_port_nr <= port_nr < self.first_port_nr + self.number_of_ports
+
+
 class Switch(models.Model):
     name = models.CharField(max_length=100, unique=True)
     duid = HexField('DUID', max_length=256, help_text="Use 'show ipv6 dhcp' to find the switch's DUID")
+    profile = models.ForeignKey(SwitchProfile, null=True, blank=True, on_delete=models.SET_NULL,
+                                help_text="Slots and modules from the profile are created automatically")
 
     # 00030001002584B1905E
     class Meta:
@@ -24,6 +113,12 @@ class Switch(models.Model):
     def number_of_ports(self):
         return Port.objects.filter(module__slot__switch=self).count()
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+
+        if self.profile:
+            self.profile.materialise(self)
+
 
 class Slot(models.Model):
     switch = models.ForeignKey(Switch)
@@ -113,6 +208,7 @@ class Port(models.Model):
         verbose_name = 'Port'
         verbose_name_plural = 'Ports'
         unique_together = (('module', 'port_nr', 'vlan'),)
+        index_together = (('new_remote_id', 'new_enterprise_number'),)
         ordering = ('module__slot__switch__name', 'module__slot__slot_nr', 'module__module_nr', 'port_nr', 'vlan')
 
     def __str__(self):
@@ -129,3 +225,52 @@ class Port(models.Model):
             descr += ' (VLAN {})'.format(self.vlan)
 
         return descr
+
+    def clean(self):
+        super().clean()
+
+        if self.module_id is None or self.port_nr is None:
+            return
+
+        # Check the port number against the profile of the switch, if it has one
+        slot = self.module.slot
+        if slot.switch.profile_id:
+            profile_slot = ProfileSlot.objects.filter(profile_id=slot.switch.profile_id, slot_nr=slot.slot_nr).first()
+            if profile_slot and not profile_slot.has_port(self.port_nr):
+                raise ValidationError({'port_nr': "Profile {} has ports {}-{} in slot {}".format(
+                    profile_slot.profile.name, profile_slot.first_port_nr,
+                    profile_slot.first_port_nr + profile_slot.number_of_ports - 1, slot.slot_nr)})
+
+
+class MappingVersion(models.Model):
+    """
+    A counter that is increased in the same transaction as every change to the mapping, so the compiled snapshot only
+    needs to be rebuilt when the counter has changed. There is only one row.
+    """
+    counter = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Mapping version'
+        verbose_name_plural = 'Mapping versions'
+
+    def __str__(self):
+        return str(self.counter)
+
+    @classmethod
+    def current(cls):
+        """
+        Get the current value of the counter.
+
+        :return: The counter
+        """
+        counter = cls.objects.filter(pk=1).values_list('counter', flat=True).first()
+        return counter or 0
+
+    @classmethod
+    def bump(cls):
+        """
+        Increase the counter. Call this after changing the mapping in a way that doesn't send model signals, like
+        QuerySet.update() and bulk_create().
+        """
+        if not cls.objects.filter(pk=1).update(counter=models.F('counter') + 1):
+            cls.objects.get_or_create(pk=1, defaults={'counter': 1})
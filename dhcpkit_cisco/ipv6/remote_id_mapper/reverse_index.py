@@ -0,0 +1,62 @@
+import codecs
+from itertools import groupby
+from operator import itemgetter
+
+from dhcpkit.utils import normalise_hex
+from dhcpkit_cisco.ipv6.remote_id_mapper.models import Port
+
+
+def remote_id_candidates(value):
+    """
+    Interpret a user-provided Remote-ID, which may be hexadecimal or ASCII.
+
+    :param value: The Remote-ID as entered
+    :return: The possible hex-encoded Remote-IDs as stored in the database
+    """
+    value = value.strip()
+    candidates = []
+
+    try:
+        candidates.append(normalise_hex(value))
+    except ValueError:
+        pass
+
+    try:
+        candidates.append(codecs.encode(value.encode('ascii'), 'hex').decode('ascii'))
+    except UnicodeEncodeError:
+        pass
+
+    return candidates
+
+
+def find_ports(new_enterprise_number, new_remote_id):
+    """
+    Find the physical ports that are rewritten to the given Remote-ID. This uses the index on
+    (new_remote_id, new_enterprise_number).
+
+    :param new_enterprise_number: The enterprise number of the rewritten Remote-ID
+    :param new_remote_id: The rewritten Remote-ID, hex-encoded
+    :return: A queryset of ports
+    """
+    return Port.objects.filter(new_enterprise_number=new_enterprise_number, new_remote_id=new_remote_id) \
+        .select_related('module__slot__switch')
+
+
+def find_duplicate_remote_ids():
+    """
+    Find rewritten Remote-IDs that are used by more than one physical port, in a single pass over the ports. Entries
+    for different VLANs of the same port may share a Remote-ID, that is not a conflict. The ports are read in index
+    order, so all entries for a Remote-ID are next to each other.
+
+    :return: A dictionary from (new_enterprise_number, new_remote_id) to the list of port ids using it
+    """
+    duplicates = {}
+
+    ports = Port.objects.order_by('new_remote_id', 'new_enterprise_number', 'id') \
+        .values_list('new_remote_id', 'new_enterprise_number', 'module_id', 'port_nr', 'id').iterator()
+    for (new_remote_id, new_enterprise_number), entries in groupby(ports, key=itemgetter(0, 1)):
+        entries = list(entries)
+        if len({(module_id, port_nr) for _, _, module_id, port_nr, _ in entries}) > 1:
+            duplicates[(new_enterprise_number, new_remote_id)] = [port_id for *_, port_id in entries]
+
+    return duplicates
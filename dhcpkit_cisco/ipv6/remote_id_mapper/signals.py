@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from dhcpkit_cisco.ipv6.remote_id_mapper.models import MappingVersion, Module, Port, Slot, Switch
+
+
+# noinspection PyUnusedLocal
+@receiver(post_save, sender=Switch)
+@receiver(post_save, sender=Slot)
+@receiver(post_save, sender=Module)
+@receiver(post_save, sender=Port)
+@receiver(post_delete, sender=Switch)
+@receiver(post_delete, sender=Slot)
+@receiver(post_delete, sender=Module)
+@receiver(post_delete, sender=Port)
+def mapping_changed(sender, **kwargs):
+    """
+    Increase the mapping version when anything that ends up in the snapshot changes.
+    """
+    if kwargs.get('raw'):
+        # Loading fixtures, the counter is increased by the next real change
+        return
+
+    MappingVersion.bump()
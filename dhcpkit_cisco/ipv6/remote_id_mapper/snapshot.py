@@ -0,0 +1,82 @@
+import gzip
+import io
+import threading
+
+from dhcpkit_cisco.ipv6.remote_id_mapper.compiler import SnapshotSink, compile_ports, iterate_switches
+from dhcpkit_cisco.ipv6.remote_id_mapper.models import MappingVersion
+from dhcpkit_cisco.ipv6.remote_id_mapping import SNAPSHOT_FORMAT_VERSION
+
+# The last compiled snapshot of this process
+cached_snapshot = None
+cached_snapshot_lock = threading.Lock()
+
+
+def write_snapshot(file, batch_size=10000, redundant_vlans=True):
+    """
+    Write the mapping from Cisco Remote-IDs to new Remote-IDs as a compact JSON document that the DHCP servers can
+    load without access to the database. The ports are streamed from the database in a fixed order, so the same data
+    always produces the same bytes and memory use doesn't grow with the number of ports.
+
+    :param file: A binary file object to write to
+    :param batch_size: The number of ports to process at a time
+    :param redundant_vlans: Whether to include VLAN-specific entries that are the same as the wildcard entry
+    :return: The version of the snapshot (a hash of the contents)
+    """
+    sink = SnapshotSink(file, iterate_switches(), SNAPSHOT_FORMAT_VERSION)
+    compile_ports(sink, batch_size=batch_size, redundant_vlans=redundant_vlans)
+    return sink.version
+
+
+def compile_snapshot():
+    """
+    Compile the mapping into memory, see write_snapshot().
+
+    :return: The snapshot as bytes and its version (a hash of the contents)
+    """
+    buffer = io.BytesIO()
+    version = write_snapshot(buffer)
+    return buffer.getvalue(), version
+
+
+class CompiledSnapshot:
+    """
+    A compiled snapshot together with the mapping version it was compiled for.
+
+    :param mapping_version: The value of the MappingVersion counter before compiling
+    :param data: The snapshot
+    :param version: The hash of the snapshot
+    """
+
+    def __init__(self, mapping_version: int, data: bytes, version: str):
+        self.mapping_version = mapping_version
+        self.data = data
+        self.version = version
+        self._gzip_data = None
+
+    @property
+    def gzip_data(self) -> bytes:
+        """
+        The compressed snapshot, compressed on first use.
+        """
+        if self._gzip_data is None:
+            self._gzip_data = gzip.compress(self.data)
+        return self._gzip_data
+
+
+def get_snapshot() -> CompiledSnapshot:
+    """
+    Get the compiled snapshot, only compiling it when the mapping has changed since the last time. The counter is read
+    before compiling, so a change during compilation causes another compilation next time instead of being missed.
+    Concurrent requests wait for a single compilation.
+
+    :return: The compiled snapshot
+    """
+    global cached_snapshot
+
+    mapping_version = MappingVersion.current()
+    with cached_snapshot_lock:
+        if cached_snapshot is None or cached_snapshot.mapping_version != mapping_version:
+            data, version = compile_snapshot()
+            cached_snapshot = CompiledSnapshot(mapping_version, data, version)
+
+        return cached_snapshot
@@ -1 +1,468 @@
-# Create your tests here.
+import hashlib
+import io
+import json
+from unittest import mock
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.test import RequestFactory, TestCase, override_settings
+
+from dhcpkit_cisco.ipv6.remote_id_mapper import snapshot
+from dhcpkit_cisco.ipv6.remote_id_mapper.admin import PortAdmin, SwitchAdmin
+from dhcpkit_cisco.ipv6.remote_id_mapper.compiler import CsvSink, compile_ports, find_dummy_module_slots, \
+    iterate_port_records
+from dhcpkit_cisco.ipv6.remote_id_mapper.forms import BulkRemoteIdAffixForm
+from dhcpkit_cisco.ipv6.remote_id_mapper.models import Module, Port, Slot, Switch, MappingVersion, ProfileSlot, \
+    SwitchProfile
+from dhcpkit_cisco.ipv6.remote_id_mapper.reverse_index import find_duplicate_remote_ids
+from dhcpkit_cisco.ipv6.remote_id_mapping import RemoteIdMapping
+
+
+@override_settings(ROOT_URLCONF='dhcpkit_cisco.ipv6.remote_id_mapper.urls', REMOTE_ID_MAPPER_TOKENS=['secret'])
+class MappingSnapshotViewTestCase(TestCase):
+    def setUp(self):
+        snapshot.cached_snapshot = None
+
+        switch = Switch.objects.create(name='sw1', duid='000300010000000000aa')
+        slot = Slot.objects.create(switch=switch, slot_nr=1)
+        self.port = Port.objects.create(module=slot.module_set.get(), port_nr=1, vlan=0,
+                                        new_enterprise_number=9, new_remote_id='aa')
+
+    def get(self, path='/mapping.json', token='secret', **headers):
+        if token:
+            headers['HTTP_AUTHORIZATION'] = 'Bearer ' + token
+        return self.client.get(path, **headers)
+
+    def test_authentication(self):
+        self.assertEqual(self.get(token=None).status_code, 401)
+        self.assertEqual(self.get(token='wrong').status_code, 401)
+        self.assertEqual(self.get(path='/lookup', token=None).status_code, 401)
+        self.assertEqual(self.get().status_code, 200)
+
+    def test_staff_user(self):
+        user = User.objects.create_user('admin', password='admin')
+        self.client.login(username='admin', password='admin')
+        self.assertEqual(self.get(token=None).status_code, 401)
+
+        user.is_superuser = True
+        user.save()
+        self.assertEqual(self.get(token=None).status_code, 200)
+
+    def test_not_modified_without_compiling(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        with mock.patch.object(snapshot, 'compile_snapshot', wraps=snapshot.compile_snapshot) as compile_snapshot:
+            response = self.get(HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+            response = self.get(HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+
+            compile_snapshot.assert_not_called()
+
+    def test_changes_are_noticed(self):
+        etag = self.get()['ETag']
+
+        self.port.new_remote_id = 'bb'
+        self.port.save()
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        etag = response['ETag']
+
+        # Bulk updates don't send signals, they need to bump the version explicitly
+        Port.objects.update(new_remote_id='cc')
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        MappingVersion.bump()
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_deletes_are_noticed(self):
+        etag = self.get()['ETag']
+        Module.objects.all().delete()
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_lookup(self):
+        response = self.get('/lookup?duid=000300010000000000aa&slot=1&module=0&port=1&vlan=10')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode('utf-8')),
+                         {'new_enterprise_number': 9, 'new_remote_id': 'aa'})
+
+        response = self.get('/lookup?duid=000300010000000000aa&slot=1&module=0&port=2&vlan=10')
+        self.assertEqual(response.status_code, 404)
+
+
+class DuplicateRemoteIdTestCase(TestCase):
+    def setUp(self):
+        switch = Switch.objects.create(name='sw1', duid='000300010000000000aa')
+        self.module = Slot.objects.create(switch=switch, slot_nr=1).module_set.get()
+
+    def add_port(self, port_nr, vlan, new_remote_id):
+        return Port.objects.create(module=self.module, port_nr=port_nr, vlan=vlan,
+                                   new_enterprise_number=9, new_remote_id=new_remote_id).id
+
+    def test_vlans_of_one_port(self):
+        self.add_port(3, 0, 'aa')
+        self.add_port(3, 10, 'aa')
+        self.add_port(4, 0, 'bb')
+        self.assertEqual(find_duplicate_remote_ids(), {})
+
+        stdout = io.StringIO()
+        call_command('find_remote_id', duplicates=True, stdout=stdout)
+        self.assertIn("No duplicate Remote-IDs found", stdout.getvalue())
+
+    def test_different_ports(self):
+        port_ids = [self.add_port(3, 0, 'aa'), self.add_port(3, 10, 'aa'), self.add_port(4, 20, 'aa')]
+        self.add_port(5, 0, 'bb')
+        self.assertEqual(find_duplicate_remote_ids(), {(9, 'aa'): port_ids})
+
+        with self.assertRaises(CommandError):
+            call_command('find_remote_id', duplicates=True, stdout=io.StringIO())
+
+
+class ListSink:
+    def __init__(self):
+        self.records = []
+        self.closed = False
+
+    def write(self, record):
+        self.records.append(record)
+
+    def close(self):
+        self.closed = True
+
+
+class CompilerTestCase(TestCase):
+    def setUp(self):
+        # A slot with only its dummy module and a slot with real modules
+        self.sw1 = Switch.objects.create(name='sw1', duid='0001')
+        self.dummy_slot = Slot.objects.create(switch=self.sw1, slot_nr=1)
+        self.module_slot = Slot.objects.create(switch=self.sw1, slot_nr=2, has_modules=True)
+        Module.objects.create(slot=self.module_slot, module_nr=0)
+        Module.objects.create(slot=self.module_slot, module_nr=1)
+
+        # Two switches that share a DUID, sw3 comes last so its entries win
+        self.sw2 = Switch.objects.create(name='sw2', duid='0002')
+        self.sw3 = Switch.objects.create(name='sw3', duid='0002')
+        Slot.objects.create(switch=self.sw2, slot_nr=1)
+        Slot.objects.create(switch=self.sw3, slot_nr=1)
+
+        self.add_port(self.sw1, 1, 0, 5, 0, 'aa')
+        self.add_port(self.sw1, 1, 0, 5, 10, 'aa')
+        self.add_port(self.sw1, 1, 0, 5, 20, 'bb')
+        self.add_port(self.sw1, 2, 0, 1, 0, 'cc')
+        self.add_port(self.sw1, 2, 1, 1, 0, 'dd')
+        self.add_port(self.sw3, 1, 0, 1, 0, 'ee')
+        self.add_port(self.sw2, 1, 0, 1, 0, 'ff')
+        self.add_port(self.sw2, 1, 0, 1, 10, 'ff')
+        self.add_port(self.sw3, 1, 0, 1, 10, 'ee')
+
+    @staticmethod
+    def add_port(switch, slot_nr, module_nr, port_nr, vlan, new_remote_id):
+        module = Module.objects.get(slot__switch=switch, slot__slot_nr=slot_nr, module_nr=module_nr)
+        Port.objects.create(module=module, port_nr=port_nr, vlan=vlan,
+                            new_enterprise_number=9, new_remote_id=new_remote_id)
+
+    def test_dummy_module_slots(self):
+        self.assertEqual(find_dummy_module_slots([self.dummy_slot.id, self.module_slot.id]), {self.dummy_slot.id})
+
+    def test_port_names(self):
+        names = [str(record) for record in iterate_port_records(batch_size=3)]
+        self.assertEqual(sorted(names), sorted(str(port) for port in Port.objects.all()))
+
+    def test_key_order(self):
+        keys = [(record.duid, record.slot_nr, record.module_nr, record.port_nr, record.vlan, record.switch_name)
+                for record in iterate_port_records(batch_size=2)]
+        self.assertEqual(keys, [
+            ('0001', 1, 0, 5, 0, 'sw1'),
+            ('0001', 1, 0, 5, 10, 'sw1'),
+            ('0001', 1, 0, 5, 20, 'sw1'),
+            ('0001', 2, 0, 1, 0, 'sw1'),
+            ('0001', 2, 1, 1, 0, 'sw1'),
+            ('0002', 1, 0, 1, 0, 'sw2'),
+            ('0002', 1, 0, 1, 0, 'sw3'),
+            ('0002', 1, 0, 1, 10, 'sw2'),
+            ('0002', 1, 0, 1, 10, 'sw3'),
+        ])
+
+    def test_skip_redundant_vlans(self):
+        sink = ListSink()
+        self.assertEqual(compile_ports(sink, redundant_vlans=False), 6)
+        self.assertTrue(sink.closed)
+
+        # VLAN 10 of sw1 is the same as its wildcard. For the shared DUID the entries of sw3 win because they come
+        # last, and its VLAN 10 is the same as its wildcard, so the VLAN 10 entry of sw2 must go as well.
+        self.assertEqual([(record.switch_name, record.vlan) for record in sink.records if record.vlan],
+                         [('sw1', 20)])
+
+        # Make sure lookups give the same results
+        full = io.BytesIO()
+        snapshot.write_snapshot(full)
+        skipped = io.BytesIO()
+        snapshot.write_snapshot(skipped, redundant_vlans=False)
+        full = RemoteIdMapping.from_snapshot(full.getvalue())
+        skipped = RemoteIdMapping.from_snapshot(skipped.getvalue())
+        self.assertEqual(len(full) - len(skipped), 2)
+
+        for duid, slot, module, port, _ in full.entries:
+            for vlan in (0, 10, 20, 30):
+                self.assertEqual(full.lookup(duid, slot, module, port, vlan),
+                                 skipped.lookup(duid, slot, module, port, vlan))
+
+    def test_csv(self):
+        output = io.StringIO()
+        compile_ports(CsvSink(output), batch_size=3)
+        self.assertEqual(output.getvalue().splitlines(), [
+            'port,duid,slot,module,port_nr,vlan,new_enterprise_number,new_remote_id',
+            'sw1 Port 1/5,0001,1,0,5,0,9,aa',
+            'sw1 Port 1/5 (VLAN 10),0001,1,0,5,10,9,aa',
+            'sw1 Port 1/5 (VLAN 20),0001,1,0,5,20,9,bb',
+            'sw1 Port 2/0/1,0001,2,0,1,0,9,cc',
+            'sw1 Port 2/1/1,0001,2,1,1,0,9,dd',
+            'sw2 Port 1/1,0002,1,0,1,0,9,ff',
+            'sw3 Port 1/1,0002,1,0,1,0,9,ee',
+            'sw2 Port 1/1 (VLAN 10),0002,1,0,1,10,9,ff',
+            'sw3 Port 1/1 (VLAN 10),0002,1,0,1,10,9,ee',
+        ])
+
+    def test_snapshot(self):
+        # The version is the ETag that DHCP servers compare against, so the bytes must never change by accident
+        expected = (b'{"format":1,'
+                    b'"switches":[["0001","sw1"],["0002","sw2"],["0002","sw3"]],'
+                    b'"ports":[["0001",1,0,5,0,9,"aa"],["0001",1,0,5,10,9,"aa"],["0001",1,0,5,20,9,"bb"],'
+                    b'["0001",2,0,1,0,9,"cc"],["0001",2,1,1,0,9,"dd"],["0002",1,0,1,0,9,"ff"],'
+                    b'["0002",1,0,1,0,9,"ee"],["0002",1,0,1,10,9,"ff"],["0002",1,0,1,10,9,"ee"]]}')
+        self.assertEqual(snapshot.compile_snapshot(), (expected, hashlib.sha256(expected).hexdigest()))
+
+        # The same bytes as encoding everything at once, also when the rows are encoded in chunks
+        for batch_size in (1, 3, 10000):
+            output = io.BytesIO()
+            version = snapshot.write_snapshot(output, batch_size=batch_size)
+            self.assertEqual(output.getvalue(), expected)
+            self.assertEqual(version, hashlib.sha256(expected).hexdigest())
+
+    def test_empty_snapshot(self):
+        Switch.objects.all().delete()
+        data, version = snapshot.compile_snapshot()
+        self.assertEqual(data, b'{"format":1,"switches":[],"ports":[]}')
+        self.assertEqual(len(RemoteIdMapping.from_snapshot(data)), 0)
+
+
+class PortAdminBulkUpdateTestCase(TestCase):
+    def setUp(self):
+        switch = Switch.objects.create(name='sw1', duid='000300010000000000aa')
+        self.module = Slot.objects.create(switch=switch, slot_nr=1).module_set.get()
+        self.port_admin = PortAdmin(Port, admin.site)
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+
+        # Only the actions are tested here, not the admin pages around them
+        patcher = mock.patch.object(admin.site, 'each_context', return_value={})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def add_port(self, port_nr, vlan=0, new_remote_id='aabb'):
+        return Port.objects.create(module=self.module, port_nr=port_nr, vlan=vlan,
+                                   new_enterprise_number=9, new_remote_id=new_remote_id)
+
+    def run_action(self, action, data, apply=True, ports=None):
+        data = dict(data, **{'_apply' if apply else '_check': '1'})
+        request = RequestFactory().post('/', data)
+        request.user = self.user
+
+        version = MappingVersion.current()
+        with mock.patch.object(self.port_admin, 'message_user'):
+            response = getattr(self.port_admin, action)(request, Port.objects.all() if ports is None else ports)
+        self.bumped = MappingVersion.current() != version
+        return response
+
+    def remote_ids(self):
+        return list(Port.objects.order_by('port_nr', 'vlan').values_list('new_remote_id', flat=True))
+
+    def test_affix_form(self):
+        # Empty values are allowed, for adding or stripping an affix
+        form = BulkRemoteIdAffixForm({'old_value_1': '', 'new_value_1': 'cc'})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data, {'old_value': '', 'new_value': 'cc'})
+
+        form = BulkRemoteIdAffixForm({'old_value_0': 'on', 'old_value_1': 'a', 'new_value_1': ''})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data, {'old_value': '61', 'new_value': ''})
+
+        form = BulkRemoteIdAffixForm({'old_value_1': '', 'new_value_1': ''})
+        self.assertFalse(form.is_valid())
+
+    def test_set_enterprise_number(self):
+        self.add_port(1)
+        self.add_port(2)
+        self.assertIsNone(self.run_action('set_enterprise_number', {'new_enterprise_number': '12345'}))
+        self.assertEqual(set(Port.objects.values_list('new_enterprise_number', flat=True)), {12345})
+        self.assertTrue(self.bumped)
+
+    def test_dry_run(self):
+        self.add_port(1, new_remote_id='aabb')
+        self.add_port(2, new_remote_id='ccdd')
+
+        response = self.run_action('replace_remote_id_prefix', {'old_value_1': 'aa', 'new_value_1': 'ee'},
+                                   apply=False)
+        self.assertEqual(response.context_data['selected_count'], 2)
+        self.assertEqual(response.context_data['affected_count'], 1)
+        self.assertEqual(response.context_data['conflicts'], [])
+        self.assertEqual(self.remote_ids(), ['aabb', 'ccdd'])
+        self.assertFalse(self.bumped)
+
+    def test_replace_prefix(self):
+        self.add_port(1, new_remote_id='aabb')
+        self.add_port(2, new_remote_id='ccdd')
+
+        self.assertIsNone(self.run_action('replace_remote_id_prefix', {'old_value_1': 'aa', 'new_value_1': 'eeff'}))
+        self.assertEqual(self.remote_ids(), ['eeffbb', 'ccdd'])
+        self.assertTrue(self.bumped)
+
+    def test_add_and_strip_prefix(self):
+        self.add_port(1, new_remote_id='aabb')
+        self.add_port(2, new_remote_id='ccdd')
+
+        self.run_action('replace_remote_id_prefix', {'old_value_1': '', 'new_value_1': 'ee'})
+        self.assertEqual(self.remote_ids(), ['eeaabb', 'eeccdd'])
+
+        self.run_action('replace_remote_id_prefix', {'old_value_1': 'ee', 'new_value_1': ''})
+        self.assertEqual(self.remote_ids(), ['aabb', 'ccdd'])
+
+    def test_replace_suffix(self):
+        self.add_port(1, new_remote_id='aabb')
+        self.add_port(2, new_remote_id='ccbb')
+        self.add_port(3, new_remote_id='ccdd')
+
+        self.run_action('replace_remote_id_suffix', {'old_value_1': 'bb', 'new_value_1': 'eeff'})
+        self.assertEqual(self.remote_ids(), ['aaeeff', 'cceeff', 'ccdd'])
+
+        self.run_action('replace_remote_id_suffix', {'old_value_1': 'ff', 'new_value_1': ''})
+        self.assertEqual(self.remote_ids(), ['aaee', 'ccee', 'ccdd'])
+
+        self.run_action('replace_remote_id_suffix', {'old_value_1': '', 'new_value_1': '11'})
+        self.assertEqual(self.remote_ids(), ['aaee11', 'ccee11', 'ccdd11'])
+
+    def test_empty_remote_id_conflict(self):
+        self.add_port(1, new_remote_id='aabb')
+        self.add_port(2, new_remote_id='bb')
+
+        for action in ('replace_remote_id_prefix', 'replace_remote_id_suffix'):
+            with self.subTest(action=action):
+                response = self.run_action(action, {'old_value_1': 'bb' if 'suffix' in action else 'aabb',
+                                                    'new_value_1': ''})
+                self.assertEqual(len(response.context_data['conflicts']), 1)
+                self.assertEqual(self.remote_ids(), ['aabb', 'bb'])
+                self.assertFalse(self.bumped)
+
+    def test_too_long_conflict(self):
+        self.add_port(1, new_remote_id='aa' * 256)
+        self.add_port(2, new_remote_id='aa')
+
+        response = self.run_action('replace_remote_id_prefix', {'old_value_1': 'aa', 'new_value_1': 'bbbb'})
+        self.assertEqual(response.context_data['conflicts'], ['sw1 Port 1/1'])
+        self.assertEqual(self.remote_ids(), ['aa' * 256, 'aa'])
+
+    def test_move_to_vlan(self):
+        self.add_port(1, vlan=10)
+        self.add_port(2, vlan=0)
+
+        self.assertIsNone(self.run_action('move_to_vlan', {'new_vlan': '20'}))
+        self.assertEqual(list(Port.objects.order_by('port_nr').values_list('vlan', flat=True)), [20, 20])
+        self.assertTrue(self.bumped)
+
+    def test_move_to_vlan_conflicts(self):
+        # The port already has an entry for the new VLAN
+        self.add_port(1, vlan=10)
+        existing = self.add_port(1, vlan=20)
+        response = self.run_action('move_to_vlan', {'new_vlan': '20'}, ports=Port.objects.filter(vlan=10))
+        self.assertEqual(response.context_data['conflicts'], [str(existing)])
+
+        # Two selected entries of the same port can't both move
+        response = self.run_action('move_to_vlan', {'new_vlan': '30'})
+        self.assertEqual(len(response.context_data['conflicts']), 2)
+
+        self.assertEqual(list(Port.objects.order_by('vlan').values_list('vlan', flat=True)), [10, 20])
+
+
+class SwitchProfileTestCase(TestCase):
+    def setUp(self):
+        self.profile = SwitchProfile.objects.create(name='stack')
+        ProfileSlot.objects.create(profile=self.profile, slot_nr=1, number_of_ports=48)
+        ProfileSlot.objects.create(profile=self.profile, slot_nr=2, has_modules=True, number_of_modules=2,
+                                   first_port_nr=0, number_of_ports=4)
+
+    def layout(self, switch):
+        return sorted(Module.objects.filter(slot__switch=switch)
+                      .values_list('slot__slot_nr', 'slot__has_modules', 'module_nr'))
+
+    def test_materialise(self):
+        version = MappingVersion.current()
+
+        # Slots are bulk created, so they don't create their own dummy modules
+        with mock.patch.object(Slot, 'save') as slot_save:
+            switch = Switch.objects.create(name='sw1', duid='0001', profile=self.profile)
+        self.assertFalse(slot_save.called)
+
+        self.assertEqual(self.layout(switch), [(1, False, 0), (2, True, 0), (2, True, 1)])
+        self.assertGreater(MappingVersion.current(), version)
+
+    def test_materialise_is_idempotent(self):
+        switch = Switch.objects.create(name='sw1', duid='0001', profile=self.profile)
+        layout = self.layout(switch)
+
+        switch.save()
+        self.assertEqual(self.layout(switch), layout)
+        self.assertEqual(self.profile.materialise(switch), 0)
+
+    def test_existing_slots_are_left_alone(self):
+        switch = Switch.objects.create(name='sw1', duid='0001')
+        Slot.objects.create(switch=switch, slot_nr=2)
+
+        version = MappingVersion.current()
+        self.assertEqual(self.profile.materialise(switch), 1)
+        self.assertEqual(self.layout(switch), [(1, False, 0), (2, False, 0)])
+        self.assertGreater(MappingVersion.current(), version)
+
+    def test_apply_profile(self):
+        Switch.objects.create(name='sw1', duid='0001')
+        Switch.objects.create(name='sw2', duid='0002')
+        Switch.objects.filter(name='sw1').update(profile=self.profile)
+
+        switch_admin = SwitchAdmin(Switch, admin.site)
+        with mock.patch.object(switch_admin, 'message_user') as message_user:
+            switch_admin.apply_profile(RequestFactory().post('/'), Switch.objects.all())
+
+        message_user.assert_called_once_with(mock.ANY, "Created 2 slots")
+        self.assertEqual(Slot.objects.filter(switch__name='sw1').count(), 2)
+        self.assertFalse(Slot.objects.filter(switch__name='sw2').exists())
+
+    def test_port_range(self):
+        switch = Switch.objects.create(name='sw1', duid='0001', profile=self.profile)
+        module_1 = Module.objects.get(slot__switch=switch, slot__slot_nr=1)
+        module_2 = Module.objects.get(slot__switch=switch, slot__slot_nr=2, module_nr=1)
+
+        def clean(module, port_nr):
+            Port(module=module, port_nr=port_nr, new_enterprise_number=9, new_remote_id='aa').clean()
+
+        # Slot 1 uses the default first port, slot 2 starts at 0
+        for module, port_nr in ((module_1, 1), (module_1, 48), (module_2, 0), (module_2, 3)):
+            clean(module, port_nr)
+
+        for module, port_nr in ((module_1, 0), (module_1, 49), (module_2, 4)):
+            with self.subTest(module=module, port_nr=port_nr), self.assertRaises(ValidationError):
+                clean(module, port_nr)
+
+        # Slots that aren't in the profile and switches without a profile aren't checked
+        clean(Slot.objects.create(switch=switch, slot_nr=3).module_set.get(), 63)
+        switch.profile = None
+        switch.save()
+        clean(Module.objects.get(pk=module_1.pk), 0)
+
+    def test_profile_slot_range(self):
+        ProfileSlot(profile=self.profile, slot_nr=3, first_port_nr=60, number_of_ports=4).clean()
+        with self.assertRaises(ValidationError):
+            ProfileSlot(profile=self.profile, slot_nr=3, first_port_nr=60, number_of_ports=5).clean()
@@ -0,0 +1,8 @@
+from django.conf.urls import url
+
+from dhcpkit_cisco.ipv6.remote_id_mapper import views
+
+urlpatterns = [
+    url(r'^mapping\.json$', views.mapping_snapshot, name='mapping_snapshot'),
+    url(r'^lookup$', views.lookup_remote_id, name='lookup_remote_id'),
+]
@@ -1 +1,127 @@
-# Create your views here.
+import functools
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, HttpResponseBadRequest, Http404
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_http_methods
+
+from dhcpkit.utils import normalise_hex
+from dhcpkit_cisco.ipv6.remote_id_mapper.models import Port
+from dhcpkit_cisco.ipv6.remote_id_mapper.snapshot import get_snapshot
+
+
+def has_mapping_access(request):
+    """
+    Check whether the request may read the mapping. DHCP servers authenticate with one of the tokens in the
+    REMOTE_ID_MAPPER_TOKENS setting as "Authorization: Bearer <token>". Logged-in users need permission to change
+    ports. Without configured tokens only logged-in users have access.
+
+    :param request: The request
+    :return: Whether access is allowed
+    """
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if authorization.startswith('Bearer '):
+        token = authorization[7:].strip().encode('utf-8')
+        for valid_token in getattr(settings, 'REMOTE_ID_MAPPER_TOKENS', ()):
+            if hmac.compare_digest(token, valid_token.encode('utf-8')):
+                return True
+
+    user = getattr(request, 'user', None)
+    return user is not None and user.has_perm('remote_id_mapper.change_port')
+
+
+def require_mapping_access(view):
+    """
+    Decorator for views that expose the mapping, which contains customer data.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not has_mapping_access(request):
+            response = HttpResponse("Authentication required", status=401, content_type='text/plain')
+            response['WWW-Authenticate'] = 'Bearer realm="remote_id_mapper"'
+            return response
+
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def parse_etags(header):
+    """
+    Parse the value of an If-None-Match header. Weak validators are accepted because If-None-Match uses the weak
+    comparison function.
+
+    :param header: The header value
+    :return: The set of entity tags without quotes, or None if the header matches everything
+    """
+    etags = set()
+    for etag in header.split(','):
+        etag = etag.strip()
+        if etag == '*':
+            return None
+
+        if etag.startswith('W/'):
+            etag = etag[2:]
+
+        etags.add(etag.strip('"'))
+
+    return etags
+
+
+@require_http_methods(['GET', 'HEAD'])
+@require_mapping_access
+def mapping_snapshot(request):
+    """
+    Serve the compiled Remote-ID mapping to DHCP servers. The ETag is a hash of the contents, so an unchanged mapping
+    results in a 304 response. Clients that accept gzip get a compressed response with its own ETag. The snapshot is
+    only compiled again when the mapping has changed, so polling is cheap.
+    """
+    snapshot = get_snapshot()
+    version = snapshot.version
+
+    use_gzip = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+    etag = '"{}-gzip"'.format(version) if use_gzip else '"{}"'.format(version)
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        if etags is None or version in etags or version + '-gzip' in etags:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            patch_vary_headers(response, ('Accept-Encoding',))
+            return response
+
+    data = snapshot.gzip_data if use_gzip else snapshot.data
+
+    response = HttpResponse(data, content_type='application/json')
+    response['ETag'] = etag
+    response['Content-Length'] = str(len(data))
+    if use_gzip:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+
+    return response
+
+
+@require_http_methods(['GET', 'HEAD'])
+@require_mapping_access
+def lookup_remote_id(request):
+    """
+    Look up the new Remote-ID for a single port, for DHCP servers that don't load the whole mapping. An entry for the
+    specific VLAN takes precedence over the wildcard VLAN 0.
+    """
+    try:
+        duid = normalise_hex(request.GET['duid'])
+        slot, module, port, vlan = [int(request.GET[name]) for name in ('slot', 'module', 'port', 'vlan')]
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest("Provide a hex duid and numeric slot, module, port and vlan")
+
+    result = Port.objects.filter(module__slot__switch__duid=duid, module__slot__slot_nr=slot,
+                                 module__module_nr=module, port_nr=port, vlan__in=(vlan, 0)) \
+        .order_by('-vlan').values('new_enterprise_number', 'new_remote_id').first()
+    if result is None:
+        raise Http404("Port not mapped")
+
+    return JsonResponse(result)
@@ -0,0 +1,74 @@
+"""
+The runtime mapping from Cisco Remote-IDs to new Remote-IDs, as distributed by the remote_id_mapper application
+"""
+import codecs
+import json
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+class RemoteIdMapping:
+    """
+    An immutable index of the mapping, keyed on (DUID, slot, module, port, VLAN). Because it is never modified after
+    creation it can be replaced atomically while other threads are using it.
+
+    :param entries: The mapping from (DUID, slot, module, port, VLAN) to (enterprise number, Remote-ID)
+    :param switch_names: The mapping from switch DUID to switch name
+    :param version: The version of the snapshot this mapping was created from
+    """
+
+    def __init__(self, entries: dict, switch_names: dict = None, version: str = None):
+        self.entries = entries
+        """The mapping from (DUID, slot, module, port, VLAN) to (enterprise number, Remote-ID)"""
+
+        self.switch_names = switch_names or {}
+        """The mapping from switch DUID to switch name"""
+
+        self.version = version
+        """The version of the snapshot this mapping was created from"""
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def from_snapshot(cls, data: bytes, version: str = None) -> 'RemoteIdMapping':
+        """
+        Create a mapping from a snapshot as produced by the remote_id_mapper application.
+
+        :param data: The JSON encoded snapshot
+        :param version: The version of the snapshot
+        :return: The new mapping
+        """
+        snapshot = json.loads(data.decode('ascii'))
+        if snapshot.get('format') != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError("Unsupported Remote-ID mapping snapshot format")
+
+        switch_names = {codecs.decode(duid, 'hex'): name for duid, name in snapshot['switches']}
+
+        # Many ports share a switch DUID, so decode each one only once
+        duids = {}
+        entries = {}
+        for duid_hex, slot, module, port, vlan, enterprise_number, remote_id_hex in snapshot['ports']:
+            duid = duids.get(duid_hex)
+            if duid is None:
+                duid = duids[duid_hex] = codecs.decode(duid_hex, 'hex')
+
+            entries[(duid, slot, module, port, vlan)] = (enterprise_number, codecs.decode(remote_id_hex, 'hex'))
+
+        return cls(entries, switch_names, version)
+
+    def lookup(self, duid: bytes, slot: int, module: int, port: int, vlan: int) -> (int, bytes) or None:
+        """
+        Find the new Remote-ID for a port. An entry for the specific VLAN takes precedence over the wildcard VLAN 0.
+
+        :param duid: The raw DUID of the switch
+        :param slot: The slot number
+        :param module: The module number
+        :param port: The port number
+        :param vlan: The VLAN
+        :return: The new enterprise number and Remote-ID, or None if the port is not mapped
+        """
+        result = self.entries.get((duid, slot, module, port, vlan))
+        if result is None and vlan:
+            result = self.entries.get((duid, slot, module, port, 0))
+        return result
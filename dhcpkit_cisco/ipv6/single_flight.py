@@ -0,0 +1,81 @@
+"""
+Coalescing of concurrent calls for the same key, so only one of them does the actual work
+"""
+import threading
+
+
+class TooManyWaitersError(Exception):
+    """
+    Raised when too many threads are already waiting for the result for a key
+    """
+
+
+class Call:
+    """
+    A call in progress and its outcome
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Let the first thread that asks for a key do the work, and give all threads that ask for the same key while that is
+    in progress the same result (or exception).
+
+    :param max_waiters: The maximum number of threads waiting for the same key, 0 means unlimited
+    :param timeout: The maximum number of seconds to wait for another thread to finish
+    """
+
+    def __init__(self, max_waiters: int = 0, timeout: float = None):
+        self.max_waiters = max_waiters
+        """The maximum number of threads waiting for the same key"""
+
+        self.timeout = timeout
+        """The maximum number of seconds to wait for another thread to finish"""
+
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, function):
+        """
+        Call the function, unless a call for the same key is already in progress, in which case its outcome is used.
+
+        :param key: The key that identifies the work
+        :param function: The function that does the work, called without arguments
+        :return: The result of the function
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            if call is None:
+                call = self.calls[key] = Call()
+                leader = True
+            else:
+                if self.max_waiters and call.waiters >= self.max_waiters:
+                    raise TooManyWaitersError("Too many threads waiting for {!r}".format(key))
+                call.waiters += 1
+                leader = False
+
+        if leader:
+            try:
+                call.result = function()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self.lock:
+                    del self.calls[key]
+                call.done.set()
+        elif not call.done.wait(self.timeout):
+            # Give up our place, so we don't count against max_waiters anymore
+            with self.lock:
+                call.waiters -= 1
+            raise TimeoutError("Timeout while waiting for {!r}".format(key))
+
+        if call.error is not None:
+            raise call.error
+
+        return call.result
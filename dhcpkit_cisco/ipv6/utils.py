@@ -0,0 +1,47 @@
+"""
+Utility functions for working with Cisco Remote-IDs in transaction bundles
+"""
+import struct
+
+from dhcpkit.ipv6.extensions.remote_id import RemoteIdOption
+from dhcpkit.ipv6.transaction_bundle import TransactionBundle
+from dhcpkit_cisco import CISCO_ENTERPRISE_ID
+from dhcpkit_cisco.ipv6.cisco_remote_id import CiscoEthernetRemoteId
+
+
+def get_cisco_remote_id(bundle: TransactionBundle) -> CiscoEthernetRemoteId or None:
+    """
+    Get the decoded Cisco Ethernet Remote-ID from the relay closest to the client. The result is stored in the bundle
+    as cisco_remote_id, together with the raw DUID of the switch as cisco_switch_duid, so the option is parsed only
+    once per request, and the original is still available after the Remote-ID has been rewritten.
+
+    :param bundle: The transaction bundle
+    :return: The decoded Remote-ID, or None if the request doesn't contain a Cisco Ethernet Remote-ID
+    """
+    try:
+        return bundle.cisco_remote_id
+    except AttributeError:
+        pass
+
+    cisco_remote_id = None
+    switch_duid = None
+
+    # Try to find a Cisco Remote-ID option
+    remote_id_option = None
+    if bundle.incoming_relay_messages:
+        remote_id_option = bundle.incoming_relay_messages[0].get_option_of_type(RemoteIdOption)
+
+    if isinstance(remote_id_option, RemoteIdOption) and remote_id_option.enterprise_number == CISCO_ENTERPRISE_ID:
+        try:
+            cisco_remote_id = CiscoEthernetRemoteId()
+            cisco_remote_id.load_from(buffer=remote_id_option.remote_id, length=len(remote_id_option.remote_id))
+
+            # The DUID is the last part of the Remote-ID, use the raw bytes as identifier of the switch
+            switch_duid = remote_id_option.remote_id[8:]
+        except (ValueError, IndexError, struct.error):
+            # Apparently not an Ethernet Remote-ID...
+            cisco_remote_id = None
+
+    bundle.cisco_remote_id = cisco_remote_id
+    bundle.cisco_switch_duid = switch_duid
+    return cisco_remote_id
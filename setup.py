@@ -60,6 +60,8 @@ setup(
         'dhcpkit.ipv6.option_handlers': [
             ('rewrite-cisco-remote-id = '
              'dhcpkit_cisco.ipv6.option_handlers.rewrite_remote_id:RewriteRemoteIdOptionHandler'),
+            ('cisco-remote-id-filter = '
+             'dhcpkit_cisco.ipv6.option_handlers.cisco_remote_id_filter:CiscoRemoteIdFilterOptionHandler'),
         ],
     },
 
@@ -0,0 +1,274 @@
+"""
+Differential fuzzing and performance tests for the Cisco Remote-ID codec. The implementation is checked against a
+straightforward reference implementation of the layout described in the CiscoEthernetRemoteId docstring.
+"""
+import codecs
+import random
+import struct
+import time
+import unittest
+
+from dhcpkit.ipv6.duids import DUID, LinkLayerDUID, LinkLayerTimeDUID, EnterpriseDUID, UnknownDUID
+from dhcpkit_cisco.ipv6.cisco_remote_id import CiscoEthernetRemoteId, CISCO_ETHERNET_REMOTE_ID
+
+# The exceptions that the codec may raise for invalid data
+PARSE_ERRORS = (ValueError, IndexError, struct.error)
+
+# Use fixed seeds so failures can be reproduced
+FUZZ_SEED = 4649
+FUZZ_ITERATIONS = 2000
+
+# Conservative lower bounds, to catch performance regressions and not slow test machines
+MIN_DECODES_PER_SECOND = 10000
+MIN_ENCODES_PER_SECOND = 10000
+PERFORMANCE_ITERATIONS = 20000
+
+
+def reference_decode(buffer: bytes, offset: int = 0, length: int = None) -> (int, int, int, int, DUID):
+    """
+    Decode a Cisco Ethernet Remote-ID field by field, as described in the CiscoEthernetRemoteId docstring.
+
+    :return: The slot, module, port, VLAN and DUID
+    """
+    if not length or len(buffer) < offset + length or length < 8:
+        raise ValueError("Invalid length")
+
+    data = buffer[offset:offset + length]
+
+    # The type is little-endian
+    if data[0] | data[1] << 8 != CISCO_ETHERNET_REMOTE_ID:
+        raise ValueError("Not an Ethernet Remote-ID")
+
+    # Interface info holds the low order bits, extension info the high order bits
+    interface_info, extension_info = data[2], data[3]
+    slot = (extension_info & 0xf0) | (interface_info >> 4)
+    module = ((extension_info >> 3) & 1) << 1 | ((interface_info >> 3) & 1)
+    port = (extension_info & 0x07) << 3 | (interface_info & 0x07)
+
+    vlan = data[4] << 8 | data[5]
+
+    duid_length = data[6] << 8 | data[7]
+    if duid_length != length - 8:
+        raise ValueError("Invalid DUID length")
+
+    duid_bytes = data[8:]
+    read_length, duid = DUID.parse(duid_bytes, length=len(duid_bytes))
+    if read_length != duid_length:
+        raise ValueError("Invalid DUID")
+
+    return slot, module, port, vlan, duid
+
+
+def reference_encode(slot: int, module: int, port: int, vlan: int, duid: DUID) -> bytes:
+    """
+    Encode a Cisco Ethernet Remote-ID field by field, as described in the CiscoEthernetRemoteId docstring.
+    """
+    interface_info = (slot & 0x0f) << 4 | (module & 1) << 3 | (port & 0x07)
+    extension_info = (slot & 0xf0) | (module >> 1) << 3 | (port >> 3)
+    duid_bytes = duid.save()
+
+    return bytes([CISCO_ETHERNET_REMOTE_ID & 0xff, CISCO_ETHERNET_REMOTE_ID >> 8,
+                  interface_info, extension_info,
+                  vlan >> 8, vlan & 0xff,
+                  len(duid_bytes) >> 8, len(duid_bytes) & 0xff]) + duid_bytes
+
+
+def implementation_decode(buffer: bytes, offset: int = 0, length: int = None) -> (int, int, int, int, DUID):
+    """
+    Decode using CiscoEthernetRemoteId.
+
+    :return: The slot, module, port, VLAN and DUID
+    """
+    remote_id = CiscoEthernetRemoteId()
+    read_length = remote_id.load_from(buffer, offset=offset, length=length)
+    if read_length != length:
+        raise ValueError("Not all data was used")
+    return remote_id.slot, remote_id.module, remote_id.port, remote_id.vlan, remote_id.duid
+
+
+def random_duid(rnd: random.Random) -> DUID:
+    """
+    Generate a random valid DUID.
+    """
+    duid_class = rnd.choice([LinkLayerDUID, LinkLayerTimeDUID, EnterpriseDUID])
+    if duid_class is LinkLayerDUID:
+        return LinkLayerDUID(hardware_type=1, link_layer_address=random_bytes(rnd, 6))
+    elif duid_class is LinkLayerTimeDUID:
+        return LinkLayerTimeDUID(hardware_type=1, time=rnd.randrange(2 ** 32), link_layer_address=random_bytes(rnd, 6))
+    else:
+        return EnterpriseDUID(enterprise_number=rnd.randrange(2 ** 32),
+                              identifier=random_bytes(rnd, rnd.randrange(1, 32)))
+
+
+def random_bytes(rnd: random.Random, length: int) -> bytes:
+    """
+    Generate random bytes.
+    """
+    return bytes(rnd.randrange(256) for _ in range(length))
+
+
+def random_remote_id(rnd: random.Random) -> CiscoEthernetRemoteId:
+    """
+    Generate a random valid Remote-ID.
+    """
+    return CiscoEthernetRemoteId(slot=rnd.randrange(2 ** 8), module=rnd.randrange(2 ** 2), port=rnd.randrange(2 ** 6),
+                                 vlan=rnd.randrange(2 ** 12), duid=random_duid(rnd))
+
+
+def outcome(decoder, buffer: bytes, offset: int, length: int):
+    """
+    Run a decoder and return either the result or a marker that the data was rejected.
+    """
+    try:
+        return decoder(buffer, offset, length)
+    except PARSE_ERRORS:
+        return 'rejected'
+
+
+class CiscoEthernetRemoteIdKnownValuesTestCase(unittest.TestCase):
+    # Examples from the CiscoEthernetRemoteId docstring
+    duid = LinkLayerDUID(hardware_type=1, link_layer_address=bytes.fromhex('c47d4f73a0bf'))
+    examples = [
+        ('020023000200000a00030001c47d4f73a0bf', 2, 0, 3),
+        ('02002a000200000a00030001c47d4f73a0bf', 2, 1, 2),
+        ('020020080200000a00030001c47d4f73a0bf', 2, 2, 0),
+        ('02002f090200000a00030001c47d4f73a0bf', 2, 3, 15),
+        ('0200280a0200000a00030001c47d4f73a0bf', 2, 3, 16),
+    ]
+
+    def test_decode(self):
+        for hex_data, slot, module, port in self.examples:
+            with self.subTest(remote_id=hex_data):
+                buffer = codecs.decode(hex_data, 'hex')
+                remote_id = CiscoEthernetRemoteId()
+                self.assertEqual(remote_id.load_from(buffer, length=len(buffer)), len(buffer))
+                self.assertEqual((remote_id.slot, remote_id.module, remote_id.port, remote_id.vlan, remote_id.duid),
+                                 (slot, module, port, 0x0200, self.duid))
+
+    def test_encode(self):
+        for hex_data, slot, module, port in self.examples:
+            with self.subTest(remote_id=hex_data):
+                remote_id = CiscoEthernetRemoteId(slot=slot, module=module, port=port, vlan=0x0200, duid=self.duid)
+                self.assertEqual(codecs.encode(remote_id.save(), 'hex').decode('ascii'), hex_data)
+
+    def test_little_endian_type(self):
+        buffer = codecs.decode(self.examples[0][0], 'hex')
+        swapped = b'\x00\x02' + buffer[2:]
+        with self.assertRaisesRegex(ValueError, 'does not contain'):
+            CiscoEthernetRemoteId().load_from(swapped, length=len(swapped))
+
+    def test_length_required(self):
+        buffer = codecs.decode(self.examples[0][0], 'hex')
+        with self.assertRaisesRegex(ValueError, 'explicitly provided'):
+            CiscoEthernetRemoteId().load_from(buffer)
+
+
+class CiscoEthernetRemoteIdFuzzTestCase(unittest.TestCase):
+    def setUp(self):
+        self.rnd = random.Random(FUZZ_SEED)
+
+    def assertSameOutcome(self, buffer: bytes, offset: int, length: int):
+        expected = outcome(reference_decode, buffer, offset, length)
+        actual = outcome(implementation_decode, buffer, offset, length)
+        self.assertEqual(actual, expected, "Mismatch for {} at offset {} with length {}".format(
+            codecs.encode(buffer, 'hex').decode('ascii'), offset, length))
+
+    def test_round_trip(self):
+        for _ in range(FUZZ_ITERATIONS):
+            remote_id = random_remote_id(self.rnd)
+            remote_id.validate()
+
+            buffer = remote_id.save()
+            self.assertEqual(buffer, reference_encode(remote_id.slot, remote_id.module, remote_id.port,
+                                                      remote_id.vlan, remote_id.duid))
+
+            decoded = CiscoEthernetRemoteId()
+            self.assertEqual(decoded.load_from(buffer, length=len(buffer)), len(buffer))
+            self.assertEqual(decoded, remote_id)
+            self.assertEqual(decoded.save(), buffer)
+
+    def test_non_zero_offsets(self):
+        for _ in range(FUZZ_ITERATIONS):
+            remote_id = random_remote_id(self.rnd)
+            prefix = random_bytes(self.rnd, self.rnd.randrange(1, 16))
+            suffix = random_bytes(self.rnd, self.rnd.randrange(16))
+            buffer = prefix + remote_id.save() + suffix
+            length = len(buffer) - len(prefix) - len(suffix)
+
+            self.assertSameOutcome(buffer, len(prefix), length)
+
+            decoded = CiscoEthernetRemoteId()
+            decoded.load_from(buffer, offset=len(prefix), length=length)
+            self.assertEqual(decoded, remote_id)
+
+    def test_truncated(self):
+        for _ in range(FUZZ_ITERATIONS // 10):
+            buffer = random_remote_id(self.rnd).save()
+            for cut in range(1, len(buffer)):
+                # Truncated buffer with the original length
+                self.assertEqual(outcome(implementation_decode, buffer[:cut], 0, len(buffer)), 'rejected')
+
+                # Truncated buffer with matching length
+                self.assertEqual(outcome(implementation_decode, buffer[:cut], 0, cut), 'rejected')
+
+    def test_wrong_duid_length(self):
+        for _ in range(FUZZ_ITERATIONS):
+            buffer = bytearray(random_remote_id(self.rnd).save())
+            duid_length = buffer[6] << 8 | buffer[7]
+            wrong_length = self.rnd.choice([0, duid_length - 1, duid_length + 1, self.rnd.randrange(2 ** 16)])
+            if wrong_length == duid_length:
+                continue
+
+            buffer[6:8] = struct.pack('!H', wrong_length)
+            self.assertEqual(outcome(implementation_decode, bytes(buffer), 0, len(buffer)), 'rejected')
+            self.assertSameOutcome(bytes(buffer), 0, len(buffer))
+
+    def test_mutations(self):
+        for _ in range(FUZZ_ITERATIONS):
+            buffer = bytearray(random_remote_id(self.rnd).save())
+            for _ in range(self.rnd.randrange(1, 4)):
+                buffer[self.rnd.randrange(len(buffer))] = self.rnd.randrange(256)
+
+            self.assertSameOutcome(bytes(buffer), 0, len(buffer))
+
+    def test_random_data(self):
+        for _ in range(FUZZ_ITERATIONS):
+            buffer = random_bytes(self.rnd, self.rnd.randrange(1, 40))
+            offset = self.rnd.randrange(len(buffer))
+            length = self.rnd.randrange(1, len(buffer) - offset + 1)
+            self.assertSameOutcome(buffer, offset, length)
+
+    def test_unknown_duid_type(self):
+        remote_id = CiscoEthernetRemoteId(slot=1, module=0, port=1, vlan=1,
+                                          duid=UnknownDUID(duid_type=99, duid_data=b'\x01\x02\x03'))
+        buffer = remote_id.save()
+        self.assertSameOutcome(buffer, 0, len(buffer))
+        self.assertEqual(implementation_decode(buffer, 0, len(buffer))[4], remote_id.duid)
+
+
+class CiscoEthernetRemoteIdPerformanceTestCase(unittest.TestCase):
+    def setUp(self):
+        rnd = random.Random(FUZZ_SEED)
+        self.remote_ids = [random_remote_id(rnd) for _ in range(100)]
+        self.buffers = [remote_id.save() for remote_id in self.remote_ids]
+
+    def test_decode_throughput(self):
+        start = time.perf_counter()
+        for i in range(PERFORMANCE_ITERATIONS):
+            buffer = self.buffers[i % len(self.buffers)]
+            CiscoEthernetRemoteId().load_from(buffer, length=len(buffer))
+        rate = PERFORMANCE_ITERATIONS / (time.perf_counter() - start)
+
+        self.assertGreaterEqual(rate, MIN_DECODES_PER_SECOND)
+
+    def test_encode_throughput(self):
+        start = time.perf_counter()
+        for i in range(PERFORMANCE_ITERATIONS):
+            self.remote_ids[i % len(self.remote_ids)].save()
+        rate = PERFORMANCE_ITERATIONS / (time.perf_counter() - start)
+
+        self.assertGreaterEqual(rate, MIN_ENCODES_PER_SECOND)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+Tests for applying option handlers to requests from specific Cisco switches, ports and VLANs
+"""
+import unittest
+from unittest import mock
+
+from dhcpkit.ipv6.extensions.remote_id import RemoteIdOption
+from dhcpkit.ipv6.option_handlers import OptionHandler
+from dhcpkit_cisco.ipv6.mapping_fetcher import MappingFetcher
+from dhcpkit_cisco.ipv6.option_handlers.cisco_remote_id_filter import CiscoRemoteIdFilterOptionHandler, \
+    CiscoRemoteIdMatcher
+from dhcpkit_cisco.ipv6.option_handlers.rewrite_remote_id import RewriteRemoteIdOptionHandler
+from dhcpkit_cisco.ipv6.remote_id_mapping import RemoteIdMapping
+from dhcpkit_cisco.ipv6.utils import get_cisco_remote_id
+from tests.ipv6.utils import OTHER_SWITCH_DUID, SWITCH_DUID, make_bundle, make_snapshot
+
+
+class CiscoRemoteIdFilterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.fetcher = MappingFetcher('http://mapper.example.com/mapping.json')
+        self.fetcher.mapping = RemoteIdMapping.from_snapshot(make_snapshot(
+            [(SWITCH_DUID.save(), 1, 0, 5, 0, 12345, b'port-5')],
+            [(SWITCH_DUID.save(), 'sw1'), (OTHER_SWITCH_DUID.save(), 'sw2')]))
+
+    def make_filter(self, **criteria) -> CiscoRemoteIdFilterOptionHandler:
+        return CiscoRemoteIdFilterOptionHandler(CiscoRemoteIdMatcher(**criteria),
+                                                [mock.Mock(spec=OptionHandler)], self.fetcher)
+
+    def assertMatches(self, option_handler: CiscoRemoteIdFilterOptionHandler, bundles: list, expected: bool):
+        for bundle in bundles:
+            with self.subTest(bundle=bundle.incoming_relay_messages[0]):
+                self.assertEqual(option_handler.match(bundle), expected)
+
+    def test_everything(self):
+        self.assertMatches(self.make_filter(), [make_bundle(), make_bundle(duid=OTHER_SWITCH_DUID)], True)
+
+    def test_numbers(self):
+        option_handler = self.make_filter(slots=frozenset({1, 2}), modules=frozenset({0}),
+                                          ports=frozenset(range(1, 25)), vlans=frozenset({10, 20}))
+        self.assertMatches(option_handler, [make_bundle(slot=2, port=24, vlan=20), make_bundle(port=1)], True)
+        self.assertMatches(option_handler, [make_bundle(slot=3), make_bundle(module=1), make_bundle(port=25),
+                                            make_bundle(vlan=0)], False)
+
+    def test_switch_duid(self):
+        option_handler = self.make_filter(switch_duids=frozenset({SWITCH_DUID.save()}))
+        self.assertMatches(option_handler, [make_bundle()], True)
+        self.assertMatches(option_handler, [make_bundle(duid=OTHER_SWITCH_DUID)], False)
+
+    def test_switch_name(self):
+        option_handler = self.make_filter(switch_names=frozenset({'sw2'}))
+        self.assertMatches(option_handler, [make_bundle(duid=OTHER_SWITCH_DUID)], True)
+        self.assertMatches(option_handler, [make_bundle()], False)
+
+        # Without a mapping the switch names are unknown
+        self.fetcher.mapping = None
+        self.assertMatches(option_handler, [make_bundle(duid=OTHER_SWITCH_DUID)], False)
+
+    def test_not_cisco(self):
+        self.assertMatches(self.make_filter(), [
+            make_bundle(enterprise_number=1234),
+            make_bundle(remote_id=b''),
+            make_bundle(remote_id=b'\x02\x00\x15\x00'),
+            make_bundle(remote_id=b'\x01\x00\x15\x00\x00\x0a\x00\x0a' + SWITCH_DUID.save()),
+            make_bundle(remote_id=b'\x02\x00\x15\x00\x00\x0a\x00\x20' + SWITCH_DUID.save()),
+        ], False)
+
+    def test_sub_handlers(self):
+        option_handler = self.make_filter(ports=frozenset({5}))
+        sub_handler = option_handler.option_handlers[0]
+
+        matching, other = make_bundle(port=5), make_bundle(port=6)
+        for bundle in (matching, other):
+            option_handler.pre(bundle)
+            option_handler.handle(bundle)
+            option_handler.post(bundle)
+
+        sub_handler.pre.assert_called_once_with(matching)
+        sub_handler.handle.assert_called_once_with(matching)
+        sub_handler.post.assert_called_once_with(matching)
+
+    def test_decoded_once(self):
+        bundle = make_bundle()
+        cisco_remote_id = get_cisco_remote_id(bundle)
+        self.assertEqual((cisco_remote_id.slot, cisco_remote_id.port, cisco_remote_id.vlan), (1, 5, 10))
+        self.assertEqual(bundle.cisco_switch_duid, SWITCH_DUID.save())
+
+        with mock.patch('dhcpkit_cisco.ipv6.cisco_remote_id.CiscoEthernetRemoteId.load_from') as load_from:
+            self.assertIs(get_cisco_remote_id(bundle), cisco_remote_id)
+            self.assertFalse(load_from.called)
+
+    def test_match_after_rewrite(self):
+        bundle = make_bundle(port=5)
+        cisco_remote_id = get_cisco_remote_id(bundle)
+
+        # The original Remote-ID is still used for matching after it has been rewritten
+        RewriteRemoteIdOptionHandler(fetcher=self.fetcher).pre(bundle)
+        self.assertEqual(bundle.incoming_relay_messages[0].get_option_of_type(RemoteIdOption).remote_id, b'port-5')
+        self.assertIs(get_cisco_remote_id(bundle), cisco_remote_id)
+        self.assertMatches(self.make_filter(ports=frozenset({5}), switch_names=frozenset({'sw1'})), [bundle], True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+Tests for creating the option handlers from a real configuration file
+"""
+import os
+import tempfile
+import textwrap
+import unittest
+
+from dhcpkit.ipv6.option_handlers.basic import PreferenceOptionHandler
+from dhcpkit.ipv6.server.config_parser import ConfigError, load_config
+from dhcpkit_cisco.ipv6.option_handlers.cisco_remote_id_filter import CiscoRemoteIdFilterOptionHandler
+from dhcpkit_cisco.ipv6.option_handlers.rewrite_remote_id import RewriteRemoteIdOptionHandler
+
+
+class ConfigTestCase(unittest.TestCase):
+    def load_config(self, text: str) -> dict:
+        with tempfile.NamedTemporaryFile('w', suffix='.conf', delete=False) as config_file:
+            config_file.write(textwrap.dedent(text))
+        self.addCleanup(os.unlink, config_file.name)
+
+        return load_config(config_file.name)
+
+    def test_rewrite_handler(self):
+        config = self.load_config("""
+            [option rewrite-cisco-remote-id]
+            log-remote-ids = yes
+            log-sample-rate = 10
+            log-rate-limit = 0.5
+        """)
+
+        handler = RewriteRemoteIdOptionHandler.from_config(config['option rewrite-cisco-remote-id'])
+        self.assertEqual(handler.log_throttle.sample_rate, 10)
+        self.assertEqual(handler.log_throttle.rate_limit, 0.5)
+
+    def test_rewrite_handler_invalid_values(self):
+        for option, value in (('log-remote-ids', 'maybe'), ('log-sample-rate', '1.5'), ('log-rate-limit', ''),
+                              ('log-sample-rate', '0')):
+            with self.subTest(option=option, value=value):
+                config = self.load_config("""
+                    [option rewrite-cisco-remote-id]
+                    {} = {}
+                """.format(option, value))
+
+                with self.assertRaisesRegex(ConfigError, option):
+                    RewriteRemoteIdOptionHandler.from_config(config['option rewrite-cisco-remote-id'])
+
+    def test_filter(self):
+        config = self.load_config("""
+            [option cisco-remote-id-filter lab]
+            switch-duid = 00:03:00:01:00:00:00:00:00:aa
+            port = 1-24 48
+            vlan = 10
+            handler = preference
+            handler-preference = 255
+        """)
+
+        handler = CiscoRemoteIdFilterOptionHandler.from_config(config['option cisco-remote-id-filter lab'],
+                                                               option_handler_id='lab')
+        self.assertEqual(handler.matcher.switch_duids, {bytes.fromhex('000300010000000000aa')})
+        self.assertIsNone(handler.matcher.slots)
+        self.assertEqual(handler.matcher.ports, set(range(1, 25)) | {48})
+        self.assertEqual(handler.matcher.vlans, {10})
+
+        self.assertEqual(len(handler.option_handlers), 1)
+        self.assertIsInstance(handler.option_handlers[0], PreferenceOptionHandler)
+        self.assertEqual(handler.option_handlers[0].option.preference, 255)
+
+    def test_filter_empty_criteria(self):
+        config = self.load_config("""
+            [option cisco-remote-id-filter]
+            slot =
+            handler = preference
+            handler-preference = 255
+        """)
+
+        with self.assertRaisesRegex(ConfigError, 'slot must not be empty'):
+            CiscoRemoteIdFilterOptionHandler.from_config(config['option cisco-remote-id-filter'])
+
+    def test_filter_without_handler(self):
+        config = self.load_config("""
+            [option cisco-remote-id-filter]
+            slot = 1
+        """)
+
+        with self.assertRaisesRegex(ConfigError, 'needs a handler'):
+            CiscoRemoteIdFilterOptionHandler.from_config(config['option cisco-remote-id-filter'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+"""
+Tests for sampling and rate limiting of log lines
+"""
+import unittest
+from unittest import mock
+
+from dhcpkit_cisco.ipv6.option_handlers.utils import LogThrottle
+
+
+class LogThrottleTestCase(unittest.TestCase):
+    def allowed_per_second(self, throttle, key=b'switch', seconds=10, attempts_per_second=10):
+        allowed = 0
+        with mock.patch('time.monotonic') as monotonic:
+            for tick in range(seconds * attempts_per_second):
+                monotonic.return_value = 1000 + tick / attempts_per_second
+                allowed += throttle.allow(key)
+        return allowed / seconds
+
+    def test_unlimited(self):
+        self.assertEqual(self.allowed_per_second(LogThrottle()), 10)
+
+    def test_sampling(self):
+        self.assertEqual(self.allowed_per_second(LogThrottle(sample_rate=5)), 2)
+
+    def test_rate_limit(self):
+        self.assertAlmostEqual(self.allowed_per_second(LogThrottle(rate_limit=3), seconds=100), 3, delta=0.1)
+
+    def test_fractional_rate_limit(self):
+        self.assertAlmostEqual(self.allowed_per_second(LogThrottle(rate_limit=0.5), seconds=100), 0.5, delta=0.02)
+
+    def test_rate_limit_per_key(self):
+        throttle = LogThrottle(rate_limit=1)
+        with mock.patch('time.monotonic', return_value=1000):
+            self.assertTrue(throttle.allow(b'one'))
+            self.assertFalse(throttle.allow(b'one'))
+            self.assertTrue(throttle.allow(b'two'))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            LogThrottle(sample_rate=0)
+        with self.assertRaises(ValueError):
+            LogThrottle(rate_limit=-1)
+
+
+if __name__ == '__main__':
+    unittest.main()
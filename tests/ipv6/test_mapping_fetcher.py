@@ -0,0 +1,262 @@
+"""
+Tests for keeping the Remote-ID mapping up to date
+"""
+import gzip
+import io
+import os
+import tempfile
+import unittest
+import urllib.error
+from unittest import mock
+
+from dhcpkit_cisco.ipv6 import mapping_fetcher
+from dhcpkit_cisco.ipv6.mapping_fetcher import MappingFetcher, get_fetcher
+from tests.ipv6.utils import SWITCH_DUID, make_snapshot
+
+URL = 'http://mapper.example.com/mapping.json'
+
+DUID = SWITCH_DUID.save()
+SNAPSHOT = make_snapshot([(DUID, 1, 0, 5, 0, 9, b'aa')], [(DUID, 'sw1')])
+NEW_SNAPSHOT = make_snapshot([(DUID, 1, 0, 5, 0, 9, b'bb')], [(DUID, 'sw1')])
+
+
+class FakeResponse(io.BytesIO):
+    def __init__(self, data: bytes, headers: dict):
+        super().__init__(data)
+        self.headers = headers
+
+
+class FakeServer:
+    """
+    Stand-in for urlopen that serves a snapshot with an ETag, honouring If-None-Match like the real view does
+    """
+
+    def __init__(self, data: bytes, etag: str = '"v1"', gzipped: bool = False):
+        self.data = data
+        self.etag = etag
+        self.gzipped = gzipped
+        self.error = None
+        self.requests = []
+
+    def urlopen(self, request, timeout=None):
+        self.requests.append(request)
+
+        if self.error:
+            raise self.error
+
+        if request.get_header('If-none-match') == self.etag:
+            raise urllib.error.HTTPError(request.full_url, 304, 'Not Modified', {}, None)
+
+        if self.gzipped:
+            return FakeResponse(gzip.compress(self.data), {'ETag': self.etag, 'Content-Encoding': 'gzip'})
+
+        return FakeResponse(self.data, {'ETag': self.etag})
+
+
+class MappingFetcherTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeServer(SNAPSHOT)
+        patcher = mock.patch('urllib.request.urlopen', side_effect=self.server.urlopen)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.fetcher = MappingFetcher(URL, token='secret')
+
+    def test_fetch(self):
+        self.assertTrue(self.fetcher.fetch())
+        self.assertEqual(self.fetcher.mapping.lookup(DUID, 1, 0, 5, 0), (9, b'aa'))
+        self.assertEqual(self.fetcher.mapping.switch_names, {DUID: 'sw1'})
+        self.assertEqual(self.fetcher.mapping.version, 'v1')
+        self.assertEqual(self.fetcher.etag, '"v1"')
+
+        request = self.server.requests[0]
+        self.assertEqual(request.get_header('Authorization'), 'Bearer secret')
+        self.assertEqual(request.get_header('Accept-encoding'), 'gzip')
+        self.assertIsNone(request.get_header('If-none-match'))
+
+    def test_not_modified(self):
+        self.fetcher.fetch()
+        mapping = self.fetcher.mapping
+
+        self.assertFalse(self.fetcher.fetch())
+        self.assertEqual(self.server.requests[1].get_header('If-none-match'), '"v1"')
+        self.assertIs(self.fetcher.mapping, mapping)
+
+    def test_gzip(self):
+        self.server.gzipped = True
+        self.assertTrue(self.fetcher.fetch())
+        self.assertEqual(self.fetcher.mapping.lookup(DUID, 1, 0, 5, 0), (9, b'aa'))
+
+    def test_swap(self):
+        self.fetcher.fetch()
+        mapping = self.fetcher.mapping
+
+        self.server.data = NEW_SNAPSHOT
+        self.server.etag = '"v2"'
+        self.assertTrue(self.fetcher.fetch())
+
+        # Readers that still hold the old mapping keep seeing a complete, unchanged mapping
+        self.assertIsNot(self.fetcher.mapping, mapping)
+        self.assertEqual(mapping.lookup(DUID, 1, 0, 5, 0), (9, b'aa'))
+        self.assertEqual(self.fetcher.mapping.lookup(DUID, 1, 0, 5, 0), (9, b'bb'))
+        self.assertEqual(self.fetcher.etag, '"v2"')
+
+    def test_broken_snapshot_keeps_mapping(self):
+        self.fetcher.fetch()
+        mapping = self.fetcher.mapping
+
+        for data in (b'{"format": 1, "switches": [], "ports": [["aa"]]}', b'not json', b'{"format": 99}'):
+            with self.subTest(data=data):
+                self.server.data = data
+                self.server.etag = '"broken"'
+
+                with self.assertLogs('dhcpkit_cisco.ipv6.mapping_fetcher', 'ERROR'):
+                    self.fetcher.refresh()
+
+                self.assertIs(self.fetcher.mapping, mapping)
+                self.assertEqual(self.fetcher.etag, '"v1"')
+
+    def test_server_error_keeps_mapping(self):
+        self.fetcher.fetch()
+        mapping = self.fetcher.mapping
+
+        self.server.error = urllib.error.HTTPError(URL, 500, 'Internal Server Error', {}, None)
+        with self.assertLogs('dhcpkit_cisco.ipv6.mapping_fetcher', 'ERROR'):
+            self.fetcher.refresh()
+
+        self.assertIs(self.fetcher.mapping, mapping)
+
+
+class MappingCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeServer(SNAPSHOT)
+        patcher = mock.patch('urllib.request.urlopen', side_effect=self.server.urlopen)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.cache_filename = os.path.join(temp_dir.name, 'mapping.cache')
+
+    def make_fetcher(self, url=URL, cache_filename=None) -> MappingFetcher:
+        fetcher = MappingFetcher(url, cache_filename=cache_filename or self.cache_filename)
+        self.addCleanup(fetcher.stop)
+        return fetcher
+
+    def write_cache(self, data: bytes):
+        with open(self.cache_filename, 'wb') as cache_file:
+            cache_file.write(data)
+
+    def test_save(self):
+        self.make_fetcher().fetch()
+        with open(self.cache_filename, 'rb') as cache_file:
+            self.assertEqual(cache_file.read(), URL.encode('ascii') + b'\n"v1"\n' + SNAPSHOT)
+
+        # A 304 leaves the cache alone
+        with mock.patch.object(MappingFetcher, 'save_cache') as save_cache:
+            fetcher = self.make_fetcher()
+            fetcher.load_cache()
+            fetcher.fetch()
+        self.assertFalse(save_cache.called)
+
+    def test_restart(self):
+        self.make_fetcher().fetch()
+
+        # After a restart the cached mapping is used, and the first poll asks whether it is still current
+        fetcher = self.make_fetcher()
+        fetcher.start()
+        self.assertEqual(self.server.requests[-1].get_header('If-none-match'), '"v1"')
+        self.assertEqual(fetcher.mapping.lookup(DUID, 1, 0, 5, 0), (9, b'aa'))
+        self.assertEqual(fetcher.mapping.version, 'v1')
+        self.assertEqual(fetcher.etag, '"v1"')
+
+    def test_restart_without_server(self):
+        self.make_fetcher().fetch()
+
+        self.server.error = urllib.error.URLError('Connection refused')
+        fetcher = self.make_fetcher()
+        with self.assertLogs('dhcpkit_cisco.ipv6.mapping_fetcher', 'ERROR'):
+            fetcher.start()
+        self.assertEqual(fetcher.mapping.lookup(DUID, 1, 0, 5, 0), (9, b'aa'))
+
+    def test_missing_cache(self):
+        fetcher = self.make_fetcher()
+        self.assertFalse(fetcher.load_cache())
+        self.assertIsNone(fetcher.mapping)
+
+    def test_other_url(self):
+        self.make_fetcher(url='http://other.example.com/mapping.json').fetch()
+
+        fetcher = self.make_fetcher()
+        with self.assertLogs('dhcpkit_cisco.ipv6.mapping_fetcher', 'WARNING'):
+            self.assertFalse(fetcher.load_cache())
+        self.assertIsNone(fetcher.mapping)
+        self.assertIsNone(fetcher.etag)
+
+    def test_corrupt_cache(self):
+        for data in (b'', URL.encode('ascii'), URL.encode('ascii') + b'\n"v1"\n' + SNAPSHOT[:-10],
+                     URL.encode('ascii') + b'\n\xff\n' + SNAPSHOT):
+            with self.subTest(data=data):
+                self.write_cache(data)
+                fetcher = self.make_fetcher()
+                with self.assertLogs('dhcpkit_cisco.ipv6.mapping_fetcher', 'WARNING'):
+                    self.assertFalse(fetcher.load_cache())
+                self.assertIsNone(fetcher.mapping)
+
+                # And the first poll fetches the whole mapping
+                fetcher.fetch()
+                self.assertIsNone(self.server.requests[-1].get_header('If-none-match'))
+
+    def test_atomic_replace(self):
+        self.make_fetcher().fetch()
+
+        # When the new cache can't be completed the old one stays intact
+        self.server.data = NEW_SNAPSHOT
+        self.server.etag = '"v2"'
+        fetcher = self.make_fetcher()
+        with mock.patch('os.replace', side_effect=OSError('Disk full')), \
+                self.assertLogs('dhcpkit_cisco.ipv6.mapping_fetcher', 'ERROR'):
+            fetcher.fetch()
+
+        self.assertEqual(fetcher.mapping.lookup(DUID, 1, 0, 5, 0), (9, b'bb'))
+        self.assertEqual(os.listdir(os.path.dirname(self.cache_filename)), ['mapping.cache'])
+        fetcher = self.make_fetcher()
+        self.assertTrue(fetcher.load_cache())
+        self.assertEqual(fetcher.etag, '"v1"')
+
+        # And the next one replaces it
+        fetcher.fetch()
+        self.assertEqual(os.listdir(os.path.dirname(self.cache_filename)), ['mapping.cache'])
+        fetcher = self.make_fetcher()
+        self.assertTrue(fetcher.load_cache())
+        self.assertEqual(fetcher.etag, '"v2"')
+
+    def test_reload_with_other_cache_file(self):
+        self.addCleanup(mapping_fetcher.fetchers.clear)
+
+        # Start without a server, so there is no mapping yet
+        self.server.error = urllib.error.URLError('Connection refused')
+        with self.assertLogs('dhcpkit_cisco.ipv6.mapping_fetcher', 'ERROR'):
+            fetcher = get_fetcher(URL, cache_filename=self.cache_filename + '.old')
+        self.addCleanup(fetcher.stop)
+        self.assertIsNone(fetcher.mapping)
+
+        # The new cache file is used straight away when there is no mapping
+        self.write_cache(URL.encode('ascii') + b'\n"v1"\n' + SNAPSHOT)
+        self.assertIs(get_fetcher(URL, cache_filename=self.cache_filename), fetcher)
+        self.assertEqual(fetcher.cache_filename, self.cache_filename)
+        self.assertEqual(fetcher.mapping.lookup(DUID, 1, 0, 5, 0), (9, b'aa'))
+
+        # And written when the mapping changes
+        self.server.error = None
+        self.server.data = NEW_SNAPSHOT
+        self.server.etag = '"v2"'
+        fetcher.fetch()
+
+        fetcher = self.make_fetcher()
+        self.assertTrue(fetcher.load_cache())
+        self.assertEqual(fetcher.etag, '"v2"')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+"""
+Tests for looking up new Remote-IDs one port at a time
+"""
+import io
+import json
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from dhcpkit_cisco.ipv6.remote_id_lookup import RemoteIdLookupClient
+
+URL = 'http://mapper.example.com/lookup'
+DUID = bytes.fromhex('000300010000000000aa')
+
+
+class RemoteIdLookupCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000
+        patcher = mock.patch('time.monotonic', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_client(self, **kwargs) -> RemoteIdLookupClient:
+        client = RemoteIdLookupClient(URL, **kwargs)
+        client.fetch = mock.Mock(side_effect=lambda key: (9, 'port-{}'.format(key[3]).encode('ascii')))
+        return client
+
+    def test_cache(self):
+        client = self.make_client()
+        for _ in range(3):
+            self.assertEqual(client.lookup(DUID, 1, 0, 5, 10), (9, b'port-5'))
+        client.fetch.assert_called_once_with((DUID, 1, 0, 5, 10))
+
+        # Each VLAN is cached separately, the lookup service takes care of the wildcard
+        client.lookup(DUID, 1, 0, 5, 20)
+        self.assertEqual(client.fetch.call_count, 2)
+
+    def test_ttl(self):
+        client = self.make_client(cache_ttl=300)
+        client.lookup(DUID, 1, 0, 5, 0)
+
+        self.now += 299
+        client.lookup(DUID, 1, 0, 5, 0)
+        self.assertEqual(client.fetch.call_count, 1)
+
+        self.now += 1
+        client.lookup(DUID, 1, 0, 5, 0)
+        self.assertEqual(client.fetch.call_count, 2)
+
+    def test_negative_caching(self):
+        client = self.make_client()
+        client.fetch.side_effect = lambda key: None
+
+        self.assertIsNone(client.lookup(DUID, 1, 0, 5, 0))
+        self.assertIsNone(client.lookup(DUID, 1, 0, 5, 0))
+        self.assertEqual(client.fetch.call_count, 1)
+
+    def test_errors_are_not_cached(self):
+        client = self.make_client()
+        client.fetch.side_effect = ValueError("Invalid response from Remote-ID lookup service")
+
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                client.lookup(DUID, 1, 0, 5, 0)
+        self.assertEqual(client.fetch.call_count, 2)
+        self.assertFalse(client.cache)
+
+    def test_eviction(self):
+        client = self.make_client(cache_size=2)
+        client.lookup(DUID, 1, 0, 1, 0)
+        client.lookup(DUID, 1, 0, 2, 0)
+
+        # Using port 1 makes port 2 the least recently used one
+        client.lookup(DUID, 1, 0, 1, 0)
+        client.lookup(DUID, 1, 0, 3, 0)
+        self.assertEqual(len(client.cache), 2)
+        self.assertEqual(client.fetch.call_count, 3)
+
+        client.lookup(DUID, 1, 0, 1, 0)
+        self.assertEqual(client.fetch.call_count, 3)
+        client.lookup(DUID, 1, 0, 2, 0)
+        self.assertEqual(client.fetch.call_count, 4)
+
+    def test_no_cache(self):
+        client = self.make_client(cache_size=0)
+        client.lookup(DUID, 1, 0, 1, 0)
+        client.lookup(DUID, 1, 0, 1, 0)
+        self.assertEqual(client.fetch.call_count, 2)
+        self.assertFalse(client.cache)
+
+
+class RemoteIdLookupConcurrencyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def slow_fetch(self, key):
+        self.release.wait(5)
+        return 9, b'port-5'
+
+    def test_concurrent_misses(self):
+        client = RemoteIdLookupClient(URL)
+        client.fetch = mock.Mock(side_effect=self.slow_fetch)
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            futures = [executor.submit(client.lookup, DUID, 1, 0, 5, 0) for _ in range(10)]
+
+            # Wait until everybody is waiting for the first request
+            deadline = time.monotonic() + 5
+            while True:
+                call = client.single_flight.calls.get((DUID, 1, 0, 5, 0))
+                if call and call.waiters == 9:
+                    break
+                if time.monotonic() > deadline:
+                    self.fail("Timeout while waiting for the threads")
+                time.sleep(0.001)
+
+            self.release.set()
+            self.assertEqual([future.result() for future in futures], [(9, b'port-5')] * 10)
+
+        client.fetch.assert_called_once_with((DUID, 1, 0, 5, 0))
+
+
+class FakeResponse(io.BytesIO):
+    pass
+
+
+class RemoteIdLookupFetchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.client = RemoteIdLookupClient(URL + '?site=lab', token='secret')
+        self.requests = []
+        self.response = None
+
+        patcher = mock.patch('urllib.request.urlopen', side_effect=self.urlopen)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def urlopen(self, request, timeout=None):
+        self.requests.append(request)
+        if isinstance(self.response, Exception):
+            raise self.response
+        return FakeResponse(self.response)
+
+    def test_fetch(self):
+        self.response = json.dumps({'new_enterprise_number': 9, 'new_remote_id': '706f72742d35'}).encode('ascii')
+        self.assertEqual(self.client.fetch((DUID, 1, 0, 5, 10)), (9, b'port-5'))
+
+        request = self.requests[0]
+        url, query = request.full_url.split('?')
+        self.assertEqual(url, URL)
+        self.assertEqual(urllib.parse.parse_qsl(query), [('site', 'lab'), ('duid', '000300010000000000aa'),
+                                                         ('slot', '1'), ('module', '0'), ('port', '5'),
+                                                         ('vlan', '10')])
+        self.assertEqual(request.get_header('Authorization'), 'Bearer secret')
+
+    def test_not_mapped(self):
+        self.response = urllib.error.HTTPError(URL, 404, 'Not Found', {}, None)
+        self.assertIsNone(self.client.fetch((DUID, 1, 0, 5, 10)))
+
+    def test_server_error(self):
+        self.response = urllib.error.HTTPError(URL, 500, 'Internal Server Error', {}, None)
+        with self.assertRaises(OSError):
+            self.client.fetch((DUID, 1, 0, 5, 10))
+
+    def test_invalid_response(self):
+        for response in (b'not json', b'[]', b'{}', b'{"new_enterprise_number": 9}',
+                         b'{"new_enterprise_number": 9, "new_remote_id": "xyz"}'):
+            with self.subTest(response=response):
+                self.response = response
+                with self.assertRaises(ValueError):
+                    self.client.fetch((DUID, 1, 0, 5, 10))
+
+
+if __name__ == '__main__':
+    unittest.main()
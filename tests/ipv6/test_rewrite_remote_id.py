@@ -0,0 +1,92 @@
+"""
+Tests for rewriting Cisco Remote-IDs
+"""
+import logging
+import unittest
+
+from dhcpkit.ipv6.extensions.remote_id import RemoteIdOption
+from dhcpkit_cisco.ipv6.mapping_fetcher import MappingFetcher
+from dhcpkit_cisco.ipv6.option_handlers.rewrite_remote_id import RewriteRemoteIdOptionHandler
+from dhcpkit_cisco.ipv6.remote_id_mapping import RemoteIdMapping
+from tests.ipv6.utils import OTHER_SWITCH_DUID, SWITCH_DUID, make_bundle, make_snapshot
+
+LOGGER_NAME = 'dhcpkit_cisco.ipv6.option_handlers.rewrite_remote_id'
+
+
+class RewriteRemoteIdLoggingTestCase(unittest.TestCase):
+    def setUp(self):
+        # Like the server, which leaves the root logger at NOTSET
+        logger = logging.getLogger(LOGGER_NAME)
+        self.addCleanup(logger.setLevel, logger.level)
+        logger.setLevel(logging.DEBUG)
+
+    def test_no_logging_by_default(self):
+        handler = RewriteRemoteIdOptionHandler.from_config({})
+        self.assertIsNone(handler.log_throttle)
+
+        with self.assertRaises(AssertionError), self.assertLogs(LOGGER_NAME, logging.DEBUG):
+            for _ in range(10):
+                handler.pre(make_bundle())
+
+    def test_opt_in(self):
+        handler = RewriteRemoteIdOptionHandler.from_config({'log-remote-ids': 'yes'})
+
+        with self.assertLogs(LOGGER_NAME, logging.DEBUG) as logs:
+            for _ in range(10):
+                handler.pre(make_bundle())
+
+        # The default rate limit is one line per switch per second
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(logs.records[0].cisco_port, 5)
+        self.assertEqual(logs.records[0].cisco_vlan, 10)
+
+
+class RewriteRemoteIdTestCase(unittest.TestCase):
+    def setUp(self):
+        duid = SWITCH_DUID.save()
+        self.fetcher = MappingFetcher('http://mapper.example.com/mapping.json')
+        self.fetcher.mapping = RemoteIdMapping.from_snapshot(make_snapshot([
+            (duid, 1, 0, 5, 0, 12345, b'port-5'),
+            (duid, 1, 0, 5, 10, 12345, b'port-5-vlan-10'),
+        ]))
+        self.handler = RewriteRemoteIdOptionHandler(fetcher=self.fetcher)
+
+    def rewrite(self, bundle) -> RemoteIdOption:
+        self.handler.pre(bundle)
+        return bundle.incoming_relay_messages[0].get_option_of_type(RemoteIdOption)
+
+    def test_vlan(self):
+        option = self.rewrite(make_bundle(vlan=10))
+        self.assertEqual((option.enterprise_number, option.remote_id), (12345, b'port-5-vlan-10'))
+
+    def test_vlan_fallback(self):
+        for vlan in (0, 20):
+            with self.subTest(vlan=vlan):
+                option = self.rewrite(make_bundle(vlan=vlan))
+                self.assertEqual((option.enterprise_number, option.remote_id), (12345, b'port-5'))
+
+    def test_substitute_option(self):
+        bundle = make_bundle()
+        relay_message = bundle.incoming_relay_messages[0]
+        original = relay_message.get_option_of_type(RemoteIdOption)
+        original_remote_id = original.remote_id
+
+        option = self.rewrite(bundle)
+        self.assertIsNot(option, original)
+        self.assertEqual(original.remote_id, original_remote_id)
+        self.assertEqual(len(relay_message.options), 2)
+
+    def test_not_mapped(self):
+        for bundle in (make_bundle(port=6), make_bundle(duid=OTHER_SWITCH_DUID), make_bundle(enterprise_number=1234)):
+            original = bundle.incoming_relay_messages[0].get_option_of_type(RemoteIdOption)
+            self.assertIs(self.rewrite(bundle), original)
+
+    def test_no_mapping_yet(self):
+        self.fetcher.mapping = None
+        bundle = make_bundle()
+        original = bundle.incoming_relay_messages[0].get_option_of_type(RemoteIdOption)
+        self.assertIs(self.rewrite(bundle), original)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+Tests for coalescing concurrent calls
+"""
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from dhcpkit_cisco.ipv6.single_flight import SingleFlight, TooManyWaitersError
+
+
+class SingleFlightTestCase(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.calls = 0
+
+        # Never leave worker threads blocked when a test fails
+        self.addCleanup(self.release.set)
+
+    def wait_until(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail("Timeout while waiting for the threads")
+            time.sleep(0.001)
+
+    @staticmethod
+    def waiters(single_flight, key='key'):
+        call = single_flight.calls.get(key)
+        return call.waiters if call else -1
+
+    def slow_function(self):
+        self.calls += 1
+        self.release.wait(5)
+        return 'result'
+
+    def failing_function(self):
+        self.calls += 1
+        self.release.wait(5)
+        raise ValueError('failed')
+
+    def run_concurrently(self, single_flight, function, count):
+        with ThreadPoolExecutor(max_workers=count) as executor:
+            futures = [executor.submit(single_flight.do, 'key', function) for _ in range(count)]
+
+            # Wait until everybody is waiting for the leader
+            self.wait_until(lambda: self.waiters(single_flight) >= count - 1)
+
+            self.release.set()
+            return futures
+
+    def test_coalesce(self):
+        single_flight = SingleFlight()
+        futures = self.run_concurrently(single_flight, self.slow_function, 10)
+        self.assertEqual([future.result() for future in futures], ['result'] * 10)
+        self.assertEqual(self.calls, 1)
+        self.assertFalse(single_flight.calls)
+
+    def test_shared_exception(self):
+        futures = self.run_concurrently(SingleFlight(), self.failing_function, 5)
+        for future in futures:
+            self.assertIsInstance(future.exception(), ValueError)
+        self.assertEqual(self.calls, 1)
+
+    def test_sequential_calls(self):
+        single_flight = SingleFlight()
+        self.release.set()
+        self.assertEqual(single_flight.do('key', self.slow_function), 'result')
+        self.assertEqual(single_flight.do('key', self.slow_function), 'result')
+        self.assertEqual(self.calls, 2)
+
+    def test_max_waiters(self):
+        single_flight = SingleFlight(max_waiters=1)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            leader = executor.submit(single_flight.do, 'key', self.slow_function)
+            self.wait_until(lambda: 'key' in single_flight.calls)
+            waiter = executor.submit(single_flight.do, 'key', self.slow_function)
+            self.wait_until(lambda: self.waiters(single_flight) >= 1)
+
+            with self.assertRaises(TooManyWaitersError):
+                single_flight.do('key', self.slow_function)
+
+            self.release.set()
+            self.assertEqual(leader.result(), 'result')
+            self.assertEqual(waiter.result(), 'result')
+
+    def test_timeout(self):
+        single_flight = SingleFlight(timeout=0.01)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            leader = executor.submit(single_flight.do, 'key', self.slow_function)
+            self.wait_until(lambda: 'key' in single_flight.calls)
+
+            with self.assertRaises(TimeoutError):
+                single_flight.do('key', self.slow_function)
+
+            self.release.set()
+            self.assertEqual(leader.result(), 'result')
+
+    def test_timeout_frees_waiter_slot(self):
+        single_flight = SingleFlight(max_waiters=1, timeout=0.01)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            leader = executor.submit(single_flight.do, 'key', self.slow_function)
+            self.wait_until(lambda: 'key' in single_flight.calls)
+
+            # Both time out instead of the second one being rejected
+            for _ in range(2):
+                with self.assertRaises(TimeoutError):
+                    single_flight.do('key', self.slow_function)
+            self.assertEqual(self.waiters(single_flight), 0)
+
+            self.release.set()
+            self.assertEqual(leader.result(), 'result')
+
+
+if __name__ == '__main__':
+    unittest.main()
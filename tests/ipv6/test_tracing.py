@@ -0,0 +1,79 @@
+"""
+Tests for tracing slow packets
+"""
+import json
+import os
+import signal
+import tempfile
+import unittest
+
+from dhcpkit_cisco.ipv6.option_handlers import tracing
+from dhcpkit_cisco.ipv6.option_handlers.tracing import SlowPacketTracer
+
+
+class SlowPacketTracerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.previous_handler = signal.getsignal(signal.SIGUSR1)
+
+    def tearDown(self):
+        signal.signal(signal.SIGUSR1, self.previous_handler)
+        tracing.signal_tracers.clear()
+        self.temp_dir.cleanup()
+
+    def read_dump(self, filename):
+        with open(os.path.join(self.temp_dir.name, filename)) as dump_file:
+            return [json.loads(line) for line in dump_file]
+
+    def make_tracer(self, filename, threshold=0.0):
+        return SlowPacketTracer(threshold=threshold, dump_filename=os.path.join(self.temp_dir.name, filename))
+
+    def test_only_slow_packets(self):
+        tracer = self.make_tracer('slow.json', threshold=3600)
+        trace = tracer.start_trace()
+        trace.mark('parse')
+        tracer.finish_trace(trace)
+        self.assertEqual(tracer.dump(), 0)
+
+    def test_dump(self):
+        tracer = self.make_tracer('dump.json')
+        trace = tracer.start_trace()
+        trace.mark('parse')
+        trace.mark('rewrite')
+        tracer.finish_trace(trace)
+
+        self.assertEqual(tracer.dump(), 1)
+        self.assertEqual(tracer.dump(), 0)
+
+        traces = self.read_dump('dump.json')
+        self.assertEqual(len(traces), 1)
+        self.assertEqual(list(traces[0]['stages_ms']), ['parse', 'rewrite'])
+
+    def test_signal_dumps_all_tracers(self):
+        tracers = [self.make_tracer('first.json'), self.make_tracer('second.json')]
+        for tracer in tracers:
+            tracer.install_signal_handler(signal.SIGUSR1)
+            tracer.finish_trace(tracer.start_trace())
+
+        os.kill(os.getpid(), signal.SIGUSR1)
+
+        self.assertEqual(len(self.read_dump('first.json')), 1)
+        self.assertEqual(len(self.read_dump('second.json')), 1)
+
+    def test_signal_handler_replaced(self):
+        first = self.make_tracer('first.json')
+        first.install_signal_handler(signal.SIGUSR1)
+
+        # Without taking the signal back the default action of SIGUSR1 would terminate the process
+        signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+        second = self.make_tracer('second.json')
+        second.install_signal_handler(signal.SIGUSR1)
+        second.finish_trace(second.start_trace())
+
+        os.kill(os.getpid(), signal.SIGUSR1)
+
+        self.assertEqual(len(self.read_dump('second.json')), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""
+Helpers to build requests and mapping snapshots for testing the option handlers
+"""
+import json
+from ipaddress import IPv6Address
+
+from dhcpkit.ipv6.duids import LinkLayerDUID
+from dhcpkit.ipv6.extensions.remote_id import RemoteIdOption
+from dhcpkit.ipv6.messages import RelayForwardMessage, SolicitMessage
+from dhcpkit.ipv6.options import RelayMessageOption
+from dhcpkit.ipv6.transaction_bundle import TransactionBundle
+from dhcpkit_cisco import CISCO_ENTERPRISE_ID
+from dhcpkit_cisco.ipv6.cisco_remote_id import CiscoEthernetRemoteId
+from dhcpkit_cisco.ipv6.remote_id_mapping import SNAPSHOT_FORMAT_VERSION
+
+SWITCH_DUID = LinkLayerDUID(hardware_type=1, link_layer_address=bytes.fromhex('0000000000aa'))
+OTHER_SWITCH_DUID = LinkLayerDUID(hardware_type=1, link_layer_address=bytes.fromhex('0000000000bb'))
+
+
+def make_bundle(slot: int = 1, module: int = 0, port: int = 5, vlan: int = 10, duid: LinkLayerDUID = SWITCH_DUID,
+                enterprise_number: int = CISCO_ENTERPRISE_ID, remote_id: bytes = None) -> TransactionBundle:
+    """
+    Build a bundle for a solicit that was relayed by a Cisco switch.
+
+    :param slot: The slot in the Cisco Remote-ID
+    :param module: The module in the Cisco Remote-ID
+    :param port: The port in the Cisco Remote-ID
+    :param vlan: The VLAN in the Cisco Remote-ID
+    :param duid: The DUID of the switch in the Cisco Remote-ID
+    :param enterprise_number: The enterprise number of the Remote-ID option
+    :param remote_id: The raw Remote-ID, which overrides the Cisco Remote-ID fields
+    :return: The transaction bundle
+    """
+    if remote_id is None:
+        remote_id = CiscoEthernetRemoteId(slot=slot, module=module, port=port, vlan=vlan, duid=duid).save()
+
+    relay_message = RelayForwardMessage(hop_count=0, link_address=IPv6Address('2001:db8::1'),
+                                        peer_address=IPv6Address('fe80::1'),
+                                        options=[RemoteIdOption(enterprise_number, remote_id),
+                                                 RelayMessageOption(relayed_message=SolicitMessage())])
+    return TransactionBundle(relay_message, received_over_multicast=False)
+
+
+def make_snapshot(ports: list, switches: list = None) -> bytes:
+    """
+    Build a mapping snapshot in the format that the remote_id_mapper application serves.
+
+    :param ports: A list of (DUID, slot, module, port, VLAN, enterprise number, Remote-ID) tuples with raw DUIDs and
+                  Remote-IDs
+    :param switches: A list of (DUID, name) tuples with raw DUIDs
+    :return: The JSON encoded snapshot
+    """
+    return json.dumps({
+        'format': SNAPSHOT_FORMAT_VERSION,
+        'switches': [[duid.hex(), name] for duid, name in switches or []],
+        'ports': [[duid.hex(), slot, module, port, vlan, enterprise_number, remote_id.hex()]
+                  for duid, slot, module, port, vlan, enterprise_number, remote_id in ports],
+    }).encode('ascii')